@@ -19,7 +19,7 @@ if python -m flake8 --config=setup.cfg 1>&2;
 then
     print_message " flake8 завершил проверку кода, ошибок не обнаружено " "="
     echo $LF 1>&2
-    if python structure_test.py
+    if python structure_test.py && python shared_modules_test.py
     then
         cd ya_news
         export DJANGO_SETTINGS_MODULE="${DJANGO_SETTINGS_MODULE:="yanews.settings"}"
@@ -45,7 +45,7 @@ then
         fi
     else
         status=$?
-        print_message " Убедитесь, что написанные вами тесты скопированы в указанные в ТЗ директории " "=" 1
+        print_message " Убедитесь, что тесты размещены в указанных в ТЗ директориях, а общие модули проектов совпадают " "=" 1
         echo \`\`\` 1>&2
         exit $status
     fi
@@ -0,0 +1,40 @@
+import re
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent
+
+# Модули, общие для обоих проектов. Проекты разворачиваются независимо,
+# поэтому у каждого своя копия; копии должны совпадать с точностью
+# до имени приложения.
+SHARED_MODULES = (
+    'aio.py',
+    'auth.py',
+    'compression.py',
+    'db.py',
+    'fields.py',
+    'middleware.py',
+    'router.py',
+    'template_cache.py',
+    'management/commands/compression_stats.py',
+)
+
+message_template = (
+    '\nКопии `{module}` в ya_news/news и ya_note/notes различаются. '
+    'Внесите изменение в обе копии.'
+)
+
+
+def normalize(path, app_name):
+    """Текст модуля с именем приложения, заменённым на APP."""
+    return re.sub(rf'\b{app_name}\b', 'APP', path.read_text(encoding='utf-8'))
+
+
+errors = []
+for module in SHARED_MODULES:
+    news = BASE_DIR / 'ya_news/news' / module
+    notes = BASE_DIR / 'ya_note/notes' / module
+    if normalize(news, 'news') != normalize(notes, 'notes'):
+        errors.append(message_template.format(module=module))
+
+
+assert not errors, ''.join(errors)
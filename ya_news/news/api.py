@@ -0,0 +1,191 @@
+import json
+from http import HTTPStatus
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.core.exceptions import ImproperlyConfigured
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.views import generic
+
+from .fields import CompressedText
+from .models import Comment, News
+from .pagination import InvalidCursor, encode_cursor, keyset_queryset
+from .views import NewsArchive, NewsDetail
+
+# Публичное имя поля -> выражение для values().
+NEWS_FIELDS = {
+    'id': 'id',
+    'title': 'title',
+    'text': 'text',
+    'date': 'date',
+    'comment_count': 'comment_count',
+}
+COMMENT_FIELDS = {
+    'id': 'id',
+    'author': 'author__username',
+    'text': 'text',
+    'created': 'created',
+}
+
+
+class BadRequest(Exception):
+    pass
+
+
+class ApiJSONEncoder(DjangoJSONEncoder):
+    """Строки values() содержат сжатый текст как CompressedText."""
+
+    def default(self, o):
+        if isinstance(o, CompressedText):
+            return str(o)
+        return super().default(o)
+
+
+def dumps(data):
+    return json.dumps(data, cls=ApiJSONEncoder, ensure_ascii=False)
+
+
+class JsonApiView(generic.View):
+    """
+    Базовый класс JSON API только для чтения.
+
+    Ответы строятся из строк values(), без создания экземпляров
+    моделей; клиент может запросить подмножество полей через ?fields=.
+    """
+    available_fields = {}
+
+    def dispatch(self, request, *args, **kwargs):
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        except (BadRequest, InvalidCursor) as error:
+            return JsonResponse(
+                {'error': str(error) or 'Некорректный курсор.'},
+                status=HTTPStatus.BAD_REQUEST,
+                json_dumps_params={'ensure_ascii': False},
+            )
+
+    def get_fields(self):
+        requested = self.request.GET.get('fields')
+        if not requested:
+            return dict(self.available_fields)
+        names = [name.strip() for name in requested.split(',')]
+        unknown = set(names) - set(self.available_fields)
+        if unknown:
+            raise BadRequest(
+                'Неизвестные поля: ' + ', '.join(sorted(unknown))
+            )
+        return {name: self.available_fields[name] for name in names}
+
+    def get_limit(self, default):
+        try:
+            limit = int(self.request.GET.get('limit', default))
+        except ValueError:
+            raise BadRequest('limit должен быть числом.')
+        return max(1, min(limit, settings.API_MAX_PAGE_SIZE))
+
+
+class JsonPageView(JsonApiView):
+    """
+    Страница строк по курсору, отдаваемая потоком (под ASGI - целиком).
+
+    Строки берутся из queryset или из менеджера model, как в
+    обобщённых представлениях списков.
+    """
+    model = None
+    queryset = None
+    ordering = ()
+    default_limit = None
+
+    def get_queryset(self):
+        if self.queryset is not None:
+            return self.queryset.all()
+        if self.model is not None:
+            return self.model._default_manager.all()
+        raise ImproperlyConfigured(
+            f'{type(self).__name__} требует model или queryset.'
+        )
+
+    def get(self, request, *args, **kwargs):
+        fields = self.get_fields()
+        lookups = set(fields.values()) | {
+            name.lstrip('-') for name in self.ordering
+        }
+        queryset = self.get_queryset()
+        rows = keyset_queryset(
+            queryset.values(*lookups),
+            self.ordering,
+            request.GET.get('after'),
+        )
+        limit = self.get_limit(self.default_limit)
+        content = self.stream(rows, fields, queryset.model, limit)
+        if isinstance(request, ASGIRequest):
+            # ASGIHandler Django 3.2 читает потоковый ответ в цикле
+            # событий, где ORM недоступен: собираем страницу здесь.
+            return HttpResponse(
+                ''.join(content), content_type='application/json'
+            )
+        return StreamingHttpResponse(
+            content, content_type='application/json'
+        )
+
+    def stream(self, rows, fields, model, limit):
+        """
+        Сериализует строки по одной, не собирая страницу в памяти.
+
+        Запрашивается limit + 1 строка: лишняя строка означает, что
+        есть следующая страница, и курсор указывается в конце ответа.
+        """
+        yield '{"results": ['
+        next_cursor, last = None, None
+        rows = rows[:limit + 1].iterator(chunk_size=settings.API_CHUNK_SIZE)
+        for index, row in enumerate(rows):
+            if index == limit:
+                next_cursor = encode_cursor(last, self.ordering, model)
+                break
+            yield ('' if index == 0 else ', ') + dumps(
+                {name: row[lookup] for name, lookup in fields.items()}
+            )
+            last = row
+        yield '], "next": ' + dumps(next_cursor) + '}'
+
+
+class NewsListApi(JsonPageView):
+    """Новости от свежих к старым, как на главной и в архиве."""
+    model = News
+    available_fields = NEWS_FIELDS
+    ordering = NewsArchive.ordering
+
+    @property
+    def default_limit(self):
+        return settings.NEWS_COUNT_ON_HOME_PAGE
+
+
+class NewsDetailApi(JsonApiView):
+    available_fields = NEWS_FIELDS
+
+    def get(self, request, pk):
+        fields = self.get_fields()
+        row = get_object_or_404(
+            News.objects.values(*set(fields.values())), pk=pk
+        )
+        return JsonResponse(
+            {name: row[lookup] for name, lookup in fields.items()},
+            encoder=ApiJSONEncoder,
+            json_dumps_params={'ensure_ascii': False},
+        )
+
+
+class CommentListApi(JsonPageView):
+    """Комментарии новости в хронологическом порядке."""
+    available_fields = COMMENT_FIELDS
+    ordering = NewsDetail.comments_ordering
+
+    @property
+    def default_limit(self):
+        return settings.COMMENTS_COUNT_ON_PAGE
+
+    def get_queryset(self):
+        news = get_object_or_404(News.objects.only('pk'), pk=self.kwargs['pk'])
+        return Comment.objects.filter(news=news)
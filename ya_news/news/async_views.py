@@ -0,0 +1,73 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponseNotAllowed
+from django.shortcuts import render
+from django.template.loader import render_to_string
+
+from .aio import condition_response, load_user, run_db
+from .cache import get_home_fragment
+from .forms import CommentForm
+from .views import (
+    NewsComment, NewsDetail, NewsList, news_etag, news_last_modified
+)
+
+# Асинхронные варианты представлений для чтения, подключаются
+# в urls.py при ASYNC_VIEWS. Работа с базой идёт через run_db(),
+# независимые запросы выполняются параллельно.
+
+
+def render_home_list():
+    return render_to_string(
+        'includes/news_list.html',
+        {'object_list': NewsList().get_queryset()}
+    )
+
+
+async def news_list(request):
+    """Главная: пользователь и кешированный список грузятся параллельно."""
+    _, news_list_html = await asyncio.gather(
+        run_db(load_user, request),
+        run_db(get_home_fragment, render_home_list),
+    )
+    return render(
+        request, NewsList.template_name, {'news_list_html': news_list_html}
+    )
+
+
+def news_validators(request, pk):
+    return news_etag(request, pk), news_last_modified(request, pk)
+
+
+async def news_detail(request, pk):
+    """
+    Новость с комментариями, как NewsDetailView.
+
+    Новость и страница комментариев читаются параллельно;
+    комментарий отправляется синхронным NewsComment.
+    """
+    if request.method == 'POST':
+        return await sync_to_async(NewsComment.as_view())(request, pk=pk)
+    if request.method not in ('GET', 'HEAD'):
+        return HttpResponseNotAllowed(('GET', 'HEAD', 'POST'))
+    is_authenticated = await run_db(load_user, request)
+    etag, last_modified = await run_db(news_validators, request, pk)
+    view = NewsDetail()
+    view.setup(request, pk=pk)
+
+    async def respond():
+        news, comments = await asyncio.gather(
+            run_db(view.get_object),
+            run_db(view.get_comments_page),
+        )
+        context = {
+            'object': news,
+            'news': news,
+            'view': view,
+            'comments': comments,
+        }
+        if is_authenticated:
+            context['form'] = CommentForm()
+        return render(request, view.template_name, context)
+
+    return await condition_response(request, etag, last_modified, respond)
@@ -0,0 +1,84 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from .router import read_from_primary
+
+HOME_VERSION_KEY = 'news:home:version'
+HOME_FRAGMENT_KEY = 'news:home:fragment:{version}'
+HOME_LOCK_KEY = 'news:home:lock:{version}'
+HOME_HITS_KEY = 'news:home:hits'
+HOME_MISSES_KEY = 'news:home:misses'
+
+
+def _incr(key):
+    """Атомарно увеличивает счётчик, создавая его при необходимости."""
+    try:
+        return cache.incr(key)
+    except ValueError:
+        if cache.add(key, 1, None):
+            return 1
+        return cache.incr(key)
+
+
+def get_home_version():
+    version = cache.get(HOME_VERSION_KEY)
+    if version is None:
+        cache.add(HOME_VERSION_KEY, 1, None)
+        version = cache.get(HOME_VERSION_KEY, 1)
+    return version
+
+
+def invalidate_home():
+    """
+    Сбрасывает кеш главной страницы, увеличивая версию ключа.
+
+    Старый фрагмент не удаляется: он остаётся доступен как устаревшая
+    копия, пока новый фрагмент собирается в одном запросе.
+    """
+    _incr(HOME_VERSION_KEY)
+
+
+def get_home_fragment(build):
+    """
+    Возвращает отрендеренный список новостей главной страницы.
+
+    При промахе фрагмент собирает только запрос, захвативший
+    блокировку текущей версии; остальные параллельные запросы
+    отдают фрагмент предыдущей версии, если он ещё в кеше.
+    Фрагмент собирается по основной базе, а не по реплике.
+    """
+    version = get_home_version()
+    fragment_key = HOME_FRAGMENT_KEY.format(version=version)
+    fragment = cache.get(fragment_key)
+    if fragment is not None:
+        _incr(HOME_HITS_KEY)
+        return fragment
+    _incr(HOME_MISSES_KEY)
+    lock_key = HOME_LOCK_KEY.format(version=version)
+    if cache.add(lock_key, True, settings.HOME_CACHE_LOCK_TIMEOUT):
+        with read_from_primary():
+            fragment = build()
+        cache.set(fragment_key, fragment, settings.HOME_CACHE_TIMEOUT)
+        cache.delete(lock_key)
+        return fragment
+    stale = cache.get(HOME_FRAGMENT_KEY.format(version=version - 1))
+    if stale is not None:
+        return stale
+    with read_from_primary():
+        return build()
+
+
+def home_cache_stats():
+    """Счётчики попаданий и промахов кеша главной страницы."""
+    hits = cache.get(HOME_HITS_KEY, 0)
+    misses = cache.get(HOME_MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': hits / total if total else 0.0,
+    }
+
+
+def reset_home_cache_stats():
+    cache.delete_many((HOME_HITS_KEY, HOME_MISSES_KEY))
@@ -0,0 +1,165 @@
+import hashlib
+import threading
+import time
+import zlib
+
+from django.conf import settings
+from django.core.cache import cache
+
+BODY_KEY = 'compression:body:{digest}'
+STATS_KEYS = {
+    'responses': 'compression:responses',
+    'cached': 'compression:cached',
+    'bytes_in': 'compression:bytes_in',
+    'bytes_out': 'compression:bytes_out',
+    'cpu_us': 'compression:cpu_us',
+}
+# wbits для zlib: формат gzip с окном 32 КиБ.
+GZIP_WBITS = 16 + zlib.MAX_WBITS
+
+
+def _compressor():
+    # В отличие от модуля gzip, zlib пишет в заголовок mtime = 0,
+    # поэтому одно и то же тело всегда сжимается в одни и те же байты.
+    return zlib.compressobj(settings.COMPRESSION_LEVEL, zlib.DEFLATED,
+                            GZIP_WBITS)
+
+
+# Счётчики процесса, ещё не перенесённые в общий кеш.
+_pending = dict.fromkeys(STATS_KEYS, 0)
+_pending_lock = threading.Lock()
+_flushed_at = time.monotonic()
+
+
+def _take_pending():
+    global _flushed_at
+    pending = dict(_pending)
+    _pending.update(dict.fromkeys(STATS_KEYS, 0))
+    _flushed_at = time.monotonic()
+    return pending
+
+
+def _add(key, value):
+    try:
+        cache.incr(key, value)
+    except ValueError:
+        if not cache.add(key, value, None):
+            cache.incr(key, value)
+
+
+def flush_stats():
+    """Переносит счётчики процесса в общий кеш, по incr на счётчик."""
+    with _pending_lock:
+        pending = _take_pending()
+    for name, value in pending.items():
+        if value:
+            _add(STATS_KEYS[name], value)
+
+
+def record(bytes_in, bytes_out, cpu, cached=False):
+    """
+    Добавляет сжатый ответ к счётчикам compression_stats().
+
+    Счётчики копятся в процессе и уходят в общий кеш раз в
+    COMPRESSION_STATS_FLUSH_INTERVAL секунд, а не пятью обращениями
+    к кешу на каждый ответ.
+    """
+    with _pending_lock:
+        for name, value in (
+            ('responses', 1),
+            ('cached', int(cached)),
+            ('bytes_in', bytes_in),
+            ('bytes_out', bytes_out),
+            ('cpu_us', round(cpu * 1e6)),
+        ):
+            _pending[name] += value
+        if time.monotonic() - _flushed_at < (
+                settings.COMPRESSION_STATS_FLUSH_INTERVAL
+        ):
+            return
+    flush_stats()
+
+
+def compression_stats():
+    """
+    Число сжатых ответов, доля сжатия и процессорное время на сжатие.
+
+    Счётчики всех процессов, включая ещё не перенесённые в кеш
+    счётчики текущего.
+    """
+    flush_stats()
+    values = cache.get_many(STATS_KEYS.values())
+    stats = {
+        name: values.get(key, 0) for name, key in STATS_KEYS.items()
+    }
+    stats['ratio'] = (
+        stats['bytes_out'] / stats['bytes_in'] if stats['bytes_in'] else 0.0
+    )
+    return stats
+
+
+def reset_compression_stats():
+    with _pending_lock:
+        _take_pending()
+    cache.delete_many(STATS_KEYS.values())
+
+
+def compress(body, cacheable=False):
+    """
+    Сжатое тело ответа и затраченное процессорное время в секундах.
+
+    Тела страниц, которые можно кешировать, хранятся сжатыми под
+    хешем исходного тела: MD5 на порядок дешевле gzip, а совпадение
+    хеша гарантирует, что сжатая копия соответствует именно этому телу.
+    """
+    started = time.thread_time()
+    key = None
+    if cacheable:
+        key = BODY_KEY.format(digest=hashlib.md5(body).hexdigest())
+        compressed = cache.get(key)
+        if compressed is not None:
+            cpu = time.thread_time() - started
+            record(len(body), len(compressed), cpu, cached=True)
+            return compressed, cpu
+    compressor = _compressor()
+    compressed = compressor.compress(body) + compressor.flush()
+    if key is not None and len(compressed) < len(body):
+        cache.set(key, compressed, settings.COMPRESSION_CACHE_TIMEOUT)
+    cpu = time.thread_time() - started
+    if len(compressed) < len(body):
+        record(len(body), len(compressed), cpu)
+    return compressed, cpu
+
+
+def compress_stream(chunks):
+    """
+    Сжимает потоковый ответ по частям, не собирая его в памяти.
+
+    Сжатые данные отдаются, как только zlib их выдаёт, и принудительно
+    (Z_SYNC_FLUSH) после каждых COMPRESSION_STREAM_FLUSH_SIZE байт
+    исходного тела: мелкие части ответа сжимаются вместе, но клиент
+    не ждёт конца потока.
+    """
+    compressor = _compressor()
+    bytes_in = bytes_out = pending = 0
+    cpu = 0.0
+    try:
+        for chunk in chunks:
+            started = time.thread_time()
+            data = compressor.compress(chunk)
+            pending += len(chunk)
+            if pending >= settings.COMPRESSION_STREAM_FLUSH_SIZE:
+                data += compressor.flush(zlib.Z_SYNC_FLUSH)
+                pending = 0
+            cpu += time.thread_time() - started
+            bytes_in += len(chunk)
+            bytes_out += len(data)
+            if data:
+                yield data
+        started = time.thread_time()
+        data = compressor.flush()
+        cpu += time.thread_time() - started
+        bytes_out += len(data)
+        yield data
+    finally:
+        record(bytes_in, bytes_out, cpu)
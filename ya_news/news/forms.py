@@ -1,7 +1,9 @@
+from django.conf import settings
 from django.forms import ModelForm
 from django.core.exceptions import ValidationError
 
 from .models import Comment
+from .profanity import ProfanityFilter
 
 BAD_WORDS = (
     'редиска',
@@ -10,6 +12,12 @@ BAD_WORDS = (
 )
 WARNING = 'Не ругайтесь!'
 
+profanity_filter = ProfanityFilter(
+    BAD_WORDS,
+    settings.BAD_WORDS_FILE,
+    settings.BAD_WORDS_RELOAD_INTERVAL,
+)
+
 
 class CommentForm(ModelForm):
 
@@ -20,8 +28,6 @@ class CommentForm(ModelForm):
     def clean_text(self):
         """Не позволяем ругаться в комментариях."""
         text = self.cleaned_data['text']
-        lowered_text = text.lower()
-        for word in BAD_WORDS:
-            if word in lowered_text:
-                raise ValidationError(WARNING)
+        if profanity_filter.contains(text):
+            raise ValidationError(WARNING)
         return text
@@ -0,0 +1,169 @@
+import logging
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from .models import Comment
+
+logger = logging.getLogger(__name__)
+
+
+class IngestQueueFull(Exception):
+    """Очередь переполнена: клиенту стоит повторить запрос позже."""
+
+
+class IngestError(Exception):
+    """Комментарий не удалось записать в базу."""
+
+
+class PendingComment:
+    """Комментарий в очереди и событие, отмечающее его запись в базу."""
+
+    def __init__(self, comment):
+        self.comment = comment
+        self.flushed = threading.Event()
+        self.error = None
+
+    def wait(self, timeout=None):
+        """
+        Ждёт записи комментария в базу.
+
+        Возвращает False, если за timeout секунд запись не произошла,
+        и выбрасывает IngestError, если комментарий не удалось записать.
+        """
+        if not self.flushed.wait(timeout):
+            return False
+        if self.error is not None:
+            raise IngestError() from self.error
+        return True
+
+
+class CommentIngestor:
+    """
+    Пакетная запись комментариев фоновым потоком.
+
+    Проверенные комментарии складываются в ограниченную очередь,
+    а фоновый поток записывает их через bulk_create одной транзакцией:
+    как только набралось batch_size штук или прошло flush_interval
+    секунд с первого комментария пакета. Так SQLite берёт блокировку
+    на запись один раз на пакет, а не на каждый POST.
+    """
+
+    def __init__(
+            self, batch_size, flush_interval, queue_size, put_timeout,
+            autostart=True
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.autostart = autostart
+        self.queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name='comment-ingestor', daemon=True
+                )
+                self._thread.start()
+
+    def submit(self, comment):
+        """
+        Ставит комментарий в очередь на запись.
+
+        Если очередь заполнена дольше put_timeout секунд, выбрасывает
+        IngestQueueFull — это и есть обратное давление на клиентов.
+        """
+        if self.autostart:
+            self.start()
+        pending = PendingComment(comment)
+        try:
+            self.queue.put(pending, timeout=self.put_timeout)
+        except queue.Full:
+            raise IngestQueueFull()
+        return pending
+
+    def collect_batch(self, block=True):
+        """Забирает из очереди следующий пакет, не больше batch_size."""
+        try:
+            batch = [self.queue.get(block=block)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def write(self, batch):
+        with transaction.atomic():
+            Comment.objects.bulk_create(
+                [pending.comment for pending in batch]
+            )
+
+    def flush(self, batch):
+        """
+        Записывает пакет; при ошибке - каждый комментарий отдельно.
+
+        Так один некорректный комментарий, например к только что
+        удалённой новости, не теряет остальные комментарии пакета.
+        """
+        try:
+            self.write(batch)
+        except Exception:
+            logger.warning(
+                'Failed to write %d comments, retrying one by one',
+                len(batch), exc_info=True,
+            )
+            for pending in batch:
+                try:
+                    self.write([pending])
+                except Exception as error:
+                    logger.exception('Failed to write comment')
+                    pending.error = error
+        finally:
+            for pending in batch:
+                pending.flushed.set()
+
+    def flush_pending(self):
+        """Синхронно записывает всё, что уже лежит в очереди."""
+        while True:
+            batch = self.collect_batch(block=False)
+            if not batch:
+                return
+            self.flush(batch)
+
+    def _run(self):
+        while True:
+            batch = self.collect_batch()
+            close_old_connections()
+            self.flush(batch)
+
+
+_ingestor = None
+_ingestor_lock = threading.Lock()
+
+
+def get_ingestor():
+    """Общий для процесса писатель, настроенный по COMMENT_INGEST."""
+    global _ingestor
+    with _ingestor_lock:
+        if _ingestor is None:
+            options = settings.COMMENT_INGEST
+            _ingestor = CommentIngestor(
+                batch_size=options['BATCH_SIZE'],
+                flush_interval=options['FLUSH_INTERVAL_MS'] / 1000,
+                queue_size=options['QUEUE_SIZE'],
+                put_timeout=options['PUT_TIMEOUT_MS'] / 1000,
+            )
+        return _ingestor
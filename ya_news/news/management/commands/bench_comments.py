@@ -0,0 +1,73 @@
+import logging
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from news.models import News
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает число POST-запросов комментариев в секунду '
+        'с пакетной записью (COMMENT_INGEST) и без неё.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=2000)
+        parser.add_argument('--threads', type=int, default=16)
+
+    def handle(self, *args, **options):
+        logging.getLogger('news.middleware').setLevel(logging.WARNING)
+        user = get_user_model().objects.create(
+            username=f'bench-{uuid.uuid4().hex[:8]}'
+        )
+        news = News.objects.create(title='Бенчмарк', text='Бенчмарк')
+        try:
+            for enabled in (False, True):
+                ingest = {**settings.COMMENT_INGEST, 'ENABLED': enabled}
+                with override_settings(
+                        ALLOWED_HOSTS=['*'], COMMENT_INGEST=ingest
+                ):
+                    rate, errors = self.run_posts(
+                        user, news, options['posts'], options['threads']
+                    )
+                mode = 'пакетная запись' if enabled else 'INSERT на POST'
+                self.stdout.write(
+                    f'{mode}: {rate:.0f} POST/с, ошибок: {errors}'
+                )
+        finally:
+            news.delete()
+            user.delete()
+
+    def run_posts(self, user, news, posts, threads):
+        url = reverse('news:detail', args=(news.pk,))
+        per_thread = posts // threads
+        errors = []
+
+        def worker():
+            client = Client()
+            client.force_login(user)
+            for index in range(per_thread):
+                try:
+                    response = client.post(url, {'text': f'Текст {index}'})
+                    if response.status_code != 302:
+                        errors.append(response.status_code)
+                except Exception as error:
+                    errors.append(error)
+            connection.close()
+
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        started = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        return per_thread * threads / elapsed, len(errors)
@@ -0,0 +1,199 @@
+import asyncio
+import io
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand
+from django.core.wsgi import get_wsgi_application
+from django.urls import reverse
+
+from news.models import Comment, News
+
+HOST = 'localhost'
+
+
+def wsgi_request(application, path):
+    """Один GET-запрос к WSGI-приложению, возвращает код ответа."""
+    environ = {
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': path,
+        'QUERY_STRING': '',
+        'SERVER_NAME': HOST,
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_HOST': HOST,
+        'wsgi.input': io.BytesIO(),
+        'wsgi.errors': sys.stderr,
+        'wsgi.url_scheme': 'http',
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    status = []
+    body = application(
+        environ, lambda code, headers: status.append(int(code[:3]))
+    )
+    for _ in body:
+        pass
+    body.close()
+    return status[0]
+
+
+async def asgi_request(application, path, body=None):
+    """
+    Один GET-запрос к ASGI-приложению, возвращает код ответа.
+
+    Части тела ответа добавляются в список body, если он передан.
+    """
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': b'',
+        'root_path': '',
+        'headers': [(b'host', HOST.encode())],
+        'client': ('127.0.0.1', 0),
+        'server': (HOST, 80),
+    }
+    status = []
+    body_sent = asyncio.Event()
+
+    async def receive():
+        if not body_sent.is_set():
+            body_sent.set()
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await asyncio.Event().wait()
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status.append(message['status'])
+        elif body is not None:
+            body.append(message.get('body', b''))
+
+    await application(scope, receive, send)
+    return status[0]
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность и задержки WSGI и ASGI '
+        'на главной и странице новости при высокой конкурентности. '
+        'Каждый режим запускается в отдельном процессе.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=5000)
+        parser.add_argument('--concurrency', type=int, default=200)
+        parser.add_argument('--comments', type=int, default=200)
+        parser.add_argument(
+            '--mode', choices=('both', 'wsgi', 'asgi'), default='both'
+        )
+        parser.add_argument('--news-id', type=int, help=(
+            'Новость для режимов wsgi и asgi; в режиме both создаётся.'
+        ))
+
+    def handle(self, *args, **options):
+        logging.getLogger('news.middleware').setLevel(logging.WARNING)
+        if options['mode'] != 'both':
+            return self.run_mode(options)
+        user = get_user_model().objects.create(
+            username=f'bench-{uuid.uuid4().hex[:8]}'
+        )
+        news = News.objects.create(title='Бенчмарк', text='Бенчмарк')
+        Comment.objects.bulk_create(
+            Comment(news=news, author=user, text=f'Комментарий {index}')
+            for index in range(options['comments'])
+        )
+        try:
+            for mode in ('wsgi', 'asgi'):
+                env = {
+                    **os.environ,
+                    'DJANGO_ASYNC_VIEWS': '1' if mode == 'asgi' else '0',
+                }
+                result = subprocess.run(
+                    [
+                        sys.executable, sys.argv[0], 'bench_http',
+                        '--mode', mode, '--news-id', str(news.pk),
+                        '--requests', str(options['requests']),
+                        '--concurrency', str(options['concurrency']),
+                    ],
+                    env=env, capture_output=True, text=True, check=True,
+                )
+                self.stdout.write(result.stdout.rstrip())
+        finally:
+            news.delete()
+            user.delete()
+
+    def run_mode(self, options):
+        paths = [
+            reverse('news:home'),
+            reverse('news:detail', args=(options['news_id'],)),
+        ]
+        for path in paths:
+            if options['mode'] == 'wsgi':
+                latencies, errors, elapsed = self.run_wsgi(path, options)
+            else:
+                latencies, errors, elapsed = asyncio.run(
+                    self.run_asgi(path, options)
+                )
+            latencies.sort()
+            p99 = latencies[int(len(latencies) * 0.99) - 1]
+            self.stdout.write(
+                f'{options["mode"].upper()} {path}: '
+                f'{len(latencies) / elapsed:.0f} запросов/с, '
+                f'p50 {statistics.median(latencies) * 1000:.1f} мс, '
+                f'p99 {p99 * 1000:.1f} мс, ошибок: {errors}'
+            )
+
+    def run_wsgi(self, path, options):
+        """Потоки сервера WSGI: по одному на одновременный запрос."""
+        application = get_wsgi_application()
+
+        def timed(_):
+            started = time.perf_counter()
+            code = wsgi_request(application, path)
+            return time.perf_counter() - started, code
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(options['concurrency']) as pool:
+            results = list(pool.map(timed, range(options['requests'])))
+        elapsed = time.perf_counter() - started
+        return (
+            [latency for latency, _ in results],
+            sum(code != 200 for _, code in results),
+            elapsed,
+        )
+
+    async def run_asgi(self, path, options):
+        """Один цикл событий, не больше concurrency запросов сразу."""
+        application = get_asgi_application()
+        semaphore = asyncio.Semaphore(options['concurrency'])
+
+        async def timed():
+            async with semaphore:
+                started = time.perf_counter()
+                code = await asgi_request(application, path)
+                return time.perf_counter() - started, code
+
+        started = time.perf_counter()
+        results = await asyncio.gather(
+            *(timed() for _ in range(options['requests']))
+        )
+        elapsed = time.perf_counter() - started
+        return (
+            [latency for latency, _ in results],
+            sum(code != 200 for _, code in results),
+            elapsed,
+        )
@@ -0,0 +1,69 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from news.profanity import Automaton, normalize
+
+ALPHABET = 'абвгдеёжзийклмнопрстуфхцчшщъыьэюя'
+
+
+def random_word(rng, length):
+    return ''.join(rng.choice(ALPHABET) for _ in range(length))
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает проверку комментариев циклом по словарю '
+        'и автоматом Ахо — Корасик.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--words', type=int, default=5000)
+        parser.add_argument('--comments', type=int, default=1000)
+        parser.add_argument('--length', type=int, default=300)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        words = [
+            random_word(rng, rng.randint(5, 10))
+            for _ in range(options['words'])
+        ]
+        comments = [
+            ' '.join(
+                random_word(rng, rng.randint(2, 8))
+                for _ in range(options['length'] // 5)
+            )
+            for _ in range(options['comments'])
+        ]
+
+        normalized_words = {normalize(word) for word in words}
+
+        # Прежний цикл из CommentForm.clean_text, но с той же
+        # нормализацией, чтобы число совпадений можно было сравнить.
+        started = time.perf_counter()
+        loop_matches = 0
+        for comment in comments:
+            text = normalize(comment)
+            loop_matches += any(word in text for word in normalized_words)
+        loop_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        automaton = Automaton(normalized_words)
+        build_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        automaton_matches = sum(
+            automaton.search(normalize(comment)) for comment in comments
+        )
+        automaton_time = time.perf_counter() - started
+
+        self.stdout.write(
+            f'Слов: {len(words)}, комментариев: {len(comments)}\n'
+            f'Цикл по словарю: {loop_time:.3f} с '
+            f'(совпадений: {loop_matches})\n'
+            f'Автомат: {automaton_time:.3f} с, построение '
+            f'{build_time:.3f} с (совпадений: {automaton_matches})\n'
+            f'Ускорение: {loop_time / automaton_time:.1f}x'
+        )
@@ -0,0 +1,133 @@
+import random
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from news.db import apply_pragmas
+
+ROWS = 10000
+READ_SQL = (
+    'SELECT count(*), max(length(text)) FROM item WHERE id BETWEEN ? AND ?'
+)
+WRITE_SQL = 'UPDATE item SET text = ? WHERE id = ?'
+
+
+def create_database(path):
+    with sqlite3.connect(path) as connection:
+        connection.execute(
+            'CREATE TABLE item (id INTEGER PRIMARY KEY, text TEXT NOT NULL)'
+        )
+        connection.executemany(
+            'INSERT INTO item (text) VALUES (?)',
+            (('x' * random.randint(100, 2000),) for _ in range(ROWS))
+        )
+    connection.close()
+
+
+def execute(connection, kind, rng):
+    """Чтение ста соседних строк или запись одной строки."""
+    start = rng.randint(1, ROWS - 100)
+    if kind == 'read':
+        connection.execute(READ_SQL, (start, start + 100)).fetchone()
+    else:
+        connection.execute(WRITE_SQL, ('y' * rng.randint(100, 2000), start))
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает конкурентные чтения и записи в SQLite: настройки '
+        'по умолчанию с новым соединением на каждую операцию против '
+        'SQLITE_PRAGMAS с постоянными соединениями.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=float, default=5)
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--writers', type=int, default=2)
+
+    def handle(self, *args, **options):
+        modes = (
+            ('default', None),
+            ('tuned', settings.SQLITE_PRAGMAS),
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            for mode, pragmas in modes:
+                path = Path(directory) / f'{mode}.sqlite3'
+                create_database(path)
+                self.report(mode, self.run(path, pragmas, options), options)
+
+    def run(self, path, pragmas, options):
+        """
+        Потоки читателей и писателей в течение options['seconds'].
+
+        Без pragmas каждая операция открывает своё соединение, как
+        Django при CONN_MAX_AGE = 0; с pragmas у потока одно соединение.
+        """
+        stop = threading.Event()
+        stats = {'read': [], 'write': [], 'errors': 0}
+        lock = threading.Lock()
+
+        def connect():
+            connection = sqlite3.connect(path, isolation_level=None)
+            if pragmas:
+                apply_pragmas(connection, pragmas)
+            return connection
+
+        def worker(kind):
+            rng = random.Random()
+            persistent = connect() if pragmas else None
+            latencies, errors = [], 0
+            while not stop.is_set():
+                started = time.perf_counter()
+                connection = persistent or connect()
+                try:
+                    execute(connection, kind, rng)
+                except sqlite3.OperationalError:
+                    errors += 1
+                else:
+                    latencies.append(time.perf_counter() - started)
+                finally:
+                    if persistent is None:
+                        connection.close()
+            if persistent is not None:
+                persistent.close()
+            with lock:
+                stats[kind].extend(latencies)
+                stats['errors'] += errors
+
+        threads = [
+            threading.Thread(target=worker, args=('read',))
+            for _ in range(options['readers'])
+        ] + [
+            threading.Thread(target=worker, args=('write',))
+            for _ in range(options['writers'])
+        ]
+        for thread in threads:
+            thread.start()
+        time.sleep(options['seconds'])
+        stop.set()
+        for thread in threads:
+            thread.join()
+        return stats
+
+    def report(self, mode, stats, options):
+        for kind in ('read', 'write'):
+            latencies = sorted(stats[kind])
+            if not latencies:
+                self.stdout.write(f'{mode} {kind}: нет успешных операций')
+                continue
+            p99 = latencies[max(int(len(latencies) * 0.99) - 1, 0)]
+            self.stdout.write(
+                f'{mode} {kind}: '
+                f'{len(latencies) / options["seconds"]:.0f} операций/с, '
+                f'p50 {statistics.median(latencies) * 1000:.2f} мс, '
+                f'p99 {p99 * 1000:.2f} мс'
+            )
+        self.stdout.write(f'{mode}: ошибок database is locked: '
+                          f'{stats["errors"]}')
@@ -0,0 +1,87 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.middleware.csrf import get_token
+from django.template import Context, Engine, engines
+from django.test import RequestFactory
+from django.utils import timezone
+
+from news.forms import CommentForm
+from news.models import Comment, News
+from news.template_cache import warm_up
+
+TEMPLATES = ('news/home.html', 'news/detail.html')
+LOADERS = (
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+)
+
+
+def build_engine(cached):
+    """Движок с настройками проекта и загрузчиком cached или без него."""
+    engine = engines['django'].engine
+    return Engine(
+        dirs=engine.dirs,
+        loaders=[('django.template.loaders.cached.Loader', LOADERS)]
+        if cached else LOADERS,
+        libraries=engine.libraries,
+        debug=False,
+    )
+
+
+def build_context(comments):
+    """Контекст страниц как у представлений, без обращений к базе."""
+    user = get_user_model()(pk=1, username='Читатель')
+    request = RequestFactory().get('/')
+    request.user = user
+    news = News(
+        pk=1, title='Новость', text='Текст новости. ' * 50,
+        date=timezone.now().date(),
+    )
+    news_list_html = ''.join(
+        f'<h3>Новость {index}</h3><div>Текст новости</div>'
+        for index in range(10)
+    )
+    return {
+        'request': request,
+        'csrf_token': get_token(request),
+        'user': user,
+        'news': news,
+        'news_list_html': news_list_html,
+        'comments': [
+            Comment(pk=index, news=news, author=user, text='Комментарий',
+                    created=timezone.now())
+            for index in range(comments)
+        ],
+        'form': CommentForm(),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает время загрузки и отрисовки шаблонов '
+        + ', '.join(TEMPLATES)
+        + ' с загрузчиком cached и без него.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--renders', type=int, default=2000)
+        parser.add_argument('--comments', type=int, default=50)
+
+    def handle(self, *args, **options):
+        context = build_context(options['comments'])
+        for name in TEMPLATES:
+            for cached in (False, True):
+                engine = build_engine(cached)
+                if cached:
+                    warm_up(engine)
+                started = time.perf_counter()
+                for _ in range(options['renders']):
+                    engine.get_template(name).render(Context(context))
+                elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f'{name} {"cached" if cached else "без кеша"}: '
+                    f'{elapsed / options["renders"] * 1e6:.0f} мкс '
+                    f'на отрисовку'
+                )
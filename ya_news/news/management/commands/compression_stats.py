@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from news.compression import compression_stats, reset_compression_stats
+
+
+class Command(BaseCommand):
+    help = 'Показывает долю сжатия ответов и процессорное время на сжатие.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset', action='store_true',
+            help='Обнулить счётчики после вывода.'
+        )
+
+    def handle(self, *args, **options):
+        stats = compression_stats()
+        self.stdout.write(
+            'Сжато ответов: {responses}, из кеша: {cached}, '
+            'байт до сжатия: {bytes_in}, после: {bytes_out}, '
+            'доля: {ratio:.2%}, процессорное время: {cpu_us} мкс'.format(
+                **stats
+            )
+        )
+        if options['reset']:
+            reset_compression_stats()
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from news.cache import home_cache_stats, reset_home_cache_stats
+
+
+class Command(BaseCommand):
+    help = 'Показывает долю попаданий в кеш главной страницы.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset', action='store_true',
+            help='Обнулить счётчики после вывода.'
+        )
+
+    def handle(self, *args, **options):
+        stats = home_cache_stats()
+        self.stdout.write(
+            'Попаданий: {hits}, промахов: {misses}, '
+            'доля попаданий: {hit_ratio:.2%}'.format(**stats)
+        )
+        if options['reset']:
+            reset_home_cache_stats()
@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from news import search
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает полнотекстовый индекс новостей и комментариев.'
+
+    def handle(self, *args, **options):
+        if not search.is_available():
+            raise CommandError(
+                'Полнотекстовый поиск доступен только в SQLite.'
+            )
+        started = time.perf_counter()
+        with transaction.atomic():
+            search.rebuild()
+        self.stdout.write(
+            f'Индекс перестроен за {time.perf_counter() - started:.2f} с'
+        )
@@ -0,0 +1,36 @@
+# Generated by Django 3.2.15 on 2026-10-18 03:05
+
+from django.db import migrations
+
+CREATE_INDEX_SQL = (
+    'CREATE VIRTUAL TABLE IF NOT EXISTS news_search USING fts5('
+    'title, text, news_id UNINDEXED, '
+    "tokenize='unicode61 remove_diacritics 2')",
+    'INSERT INTO news_search (rowid, title, text, news_id) '
+    'SELECT id * 2, title, text, id FROM news_news',
+    'INSERT INTO news_search (rowid, title, text, news_id) '
+    "SELECT id * 2 + 1, '', text, news_id FROM news_comment",
+)
+
+
+def create_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in CREATE_INDEX_SQL:
+        schema_editor.execute(sql)
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS news_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0005_news_modified'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
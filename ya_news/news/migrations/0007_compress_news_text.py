@@ -0,0 +1,71 @@
+# Generated by Django 3.2.15 on 2026-10-18 02:43
+
+import zlib
+
+from django.db import migrations
+import news.fields
+from news.fields import DEFAULT_THRESHOLD
+
+
+BATCH_SIZE = 500
+
+
+def convert_texts(table, convert):
+    def run(apps, schema_editor):
+        """Переписывает тексты порциями по BATCH_SIZE строк."""
+        last_id = 0
+        with schema_editor.connection.cursor() as cursor:
+            while True:
+                cursor.execute(
+                    f'SELECT id, text FROM {table} WHERE id > %s '
+                    f'ORDER BY id LIMIT %s',
+                    (last_id, BATCH_SIZE)
+                )
+                rows = cursor.fetchall()
+                if not rows:
+                    break
+                last_id = rows[-1][0]
+                changed = []
+                for pk, text in rows:
+                    value = convert(text)
+                    if value is not text:
+                        changed.append((value, pk))
+                cursor.executemany(
+                    f'UPDATE {table} SET text = %s WHERE id = %s', changed
+                )
+    return run
+
+
+def compress(text):
+    if isinstance(text, bytes):
+        return text
+    data = text.encode()
+    if len(data) < DEFAULT_THRESHOLD:
+        return text
+    compressed = zlib.compress(data)
+    return compressed if len(compressed) < len(data) else text
+
+
+def decompress(text):
+    if isinstance(text, bytes):
+        return zlib.decompress(text).decode()
+    return text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0006_news_search'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='news',
+            name='text',
+            field=news.fields.CompressedTextField(),
+        ),
+        migrations.RunPython(
+            convert_texts('news_news', compress),
+            convert_texts('news_news', decompress),
+        ),
+    ]
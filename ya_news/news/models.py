@@ -2,15 +2,53 @@ from datetime import datetime
 
 from django.conf import settings
 from django.db import models
+from django.db.models.functions import Coalesce
+from django.dispatch import Signal
+
+from .cache import invalidate_home
+from .fields import CompressedTextField
+
+# Отправляется после Comment.objects.bulk_create(),
+# который не вызывает post_save для отдельных объектов.
+comments_bulk_created = Signal()
+
+
+class NewsQuerySet(models.QuerySet):
+
+    def recount_comments(self):
+        """
+        Пересчитывает comment_count одним UPDATE с подзапросом.
+
+        update() не отправляет сигналы, поэтому кеш главной страницы
+        сбрасывается здесь же.
+        """
+        counts = Comment.objects.filter(
+            news=models.OuterRef('pk')
+        ).order_by().values('news').annotate(
+            count=models.Count('pk')
+        ).values('count')
+        updated = self.update(comment_count=Coalesce(
+            models.Subquery(counts), 0
+        ))
+        invalidate_home()
+        return updated
 
 
 class News(models.Model):
     title = models.CharField(max_length=50)
-    text = models.TextField()
+    text = CompressedTextField()
     date = models.DateField(default=datetime.today)
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
+    # Меняется и при изменении комментариев: служит версией страницы.
+    modified = models.DateTimeField(auto_now=True)
+
+    objects = NewsQuerySet.as_manager()
 
     class Meta:
         ordering = ('-date',)
+        indexes = (
+            models.Index(fields=('date', 'id'), name='news_date_id_idx'),
+        )
         verbose_name_plural = 'Новости'
         verbose_name = 'Новость'
 
@@ -18,6 +56,15 @@ class News(models.Model):
         return self.title
 
 
+class CommentQuerySet(models.QuerySet):
+
+    def bulk_create(self, objs, *args, **kwargs):
+        """Сообщаем о массовом создании, чтобы обновить счётчики."""
+        objs = super().bulk_create(objs, *args, **kwargs)
+        comments_bulk_created.send(sender=self.model, objs=objs)
+        return objs
+
+
 class Comment(models.Model):
     news = models.ForeignKey(
         News,
@@ -30,8 +77,16 @@ class Comment(models.Model):
     text = models.TextField()
     created = models.DateTimeField(auto_now_add=True)
 
+    objects = CommentQuerySet.as_manager()
+
     class Meta:
         ordering = ('created',)
+        indexes = (
+            models.Index(
+                fields=('news', 'created', 'id'),
+                name='comment_news_created_id_idx',
+            ),
+        )
 
     def __str__(self):
         return self.text[:50]
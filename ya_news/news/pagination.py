@@ -0,0 +1,151 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+from .db import SQL_INTEGER_MAX, SQL_INTEGER_MIN
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class KeysetPage:
+    """Страница выборки, полученная по курсору, а не через OFFSET."""
+
+    def __init__(self, object_list, next_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+
+def _fields(model, ordering):
+    return [model._meta.get_field(name.lstrip('-')) for name in ordering]
+
+
+def encode_values(values):
+    """Упаковывает список JSON-значений в строку для URL."""
+    raw = json.dumps(values, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_values(cursor, length):
+    """Разбирает курсор обратно в список из length значений."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidCursor(cursor)
+    if not isinstance(values, list) or len(values) != length:
+        raise InvalidCursor(cursor)
+    return values
+
+
+def _cursor_value(field, obj):
+    if isinstance(obj, dict):
+        value = obj[field.name]
+        return value.isoformat() if hasattr(value, 'isoformat') else value
+    return field.value_to_string(obj)
+
+
+def encode_cursor(obj, ordering, model=None):
+    """
+    Упаковывает значения полей сортировки объекта в строку для URL.
+
+    Объектом может быть и строка values(), тогда нужно указать model.
+    """
+    return encode_values([
+        _cursor_value(field, obj)
+        for field in _fields(model or type(obj), ordering)
+    ])
+
+
+def _clean(field, value):
+    """
+    Значение поля из курсора или ValidationError.
+
+    to_python() пропускает None и на значениях чужого типа падает
+    с TypeError, а целые вне диапазона INTEGER уронили бы сам запрос.
+    """
+    if value is None:
+        raise ValidationError('Пустое значение в курсоре.')
+    try:
+        value = field.to_python(value)
+    except (TypeError, ValueError) as error:
+        raise ValidationError(str(error))
+    if isinstance(value, int):
+        if not SQL_INTEGER_MIN <= value <= SQL_INTEGER_MAX:
+            raise ValidationError('Число вне диапазона.')
+    field.run_validators(value)
+    return value
+
+
+def decode_cursor(cursor, model, ordering):
+    """Разбирает курсор обратно в значения полей сортировки."""
+    fields = _fields(model, ordering)
+    values = decode_values(cursor, len(fields))
+    try:
+        return [_clean(field, value) for field, value in zip(fields, values)]
+    except ValidationError:
+        raise InvalidCursor(cursor)
+
+
+def keyset_filter(ordering, values):
+    """
+    Условие «строго после курсора» для составного ключа сортировки.
+
+    Первое поле ограничено диапазоном (>= или <=), чтобы SQLite
+    мог начать просмотр составного индекса прямо с позиции курсора.
+    """
+    lookups = [
+        (name.lstrip('-'), 'lt' if name.startswith('-') else 'gt')
+        for name in ordering
+    ]
+    after = Q()
+    for index, (name, lookup) in enumerate(lookups):
+        condition = Q(**{f'{name}__{lookup}': values[index]})
+        for (prev_name, _), prev_value in zip(lookups, values[:index]):
+            condition &= Q(**{prev_name: prev_value})
+        after |= condition
+    first_name, first_lookup = lookups[0]
+    return Q(**{f'{first_name}__{first_lookup}e': values[0]}) & after
+
+
+def keyset_queryset(queryset, ordering, cursor=None):
+    """Упорядоченная выборка строк, идущих после курсора."""
+    queryset = queryset.order_by(*ordering)
+    if cursor:
+        values = decode_cursor(cursor, queryset.model, ordering)
+        queryset = queryset.filter(keyset_filter(ordering, values))
+    return queryset
+
+
+def keyset_page(queryset, ordering, size, cursor=None):
+    """
+    Возвращает страницу из size объектов после курсора.
+
+    Стоимость запроса не зависит от номера страницы: вместо OFFSET
+    используется условие по значениям полей последней строки.
+    """
+    object_list = list(keyset_queryset(queryset, ordering, cursor)[:size + 1])
+    next_cursor = None
+    if len(object_list) > size:
+        object_list = object_list[:size]
+        next_cursor = encode_cursor(
+            object_list[-1], ordering, queryset.model
+        )
+    return KeysetPage(object_list, next_cursor)
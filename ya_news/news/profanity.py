@@ -0,0 +1,135 @@
+import os
+import re
+import threading
+import time
+from collections import deque
+
+# Латинские буквы, похожие на кириллические, и «ё» приводим
+# к одному написанию, чтобы «рeдиска» с латинской e не проходила.
+LOOKALIKES = str.maketrans({
+    'a': 'а', 'b': 'в', 'c': 'с', 'e': 'е', 'h': 'н', 'k': 'к',
+    'm': 'м', 'o': 'о', 'p': 'р', 't': 'т', 'x': 'х', 'y': 'у',
+    'ё': 'е',
+})
+REPEATED_CHARS = re.compile(r'(.)\1+')
+
+
+def normalize(text):
+    """Нижний регистр, замена двойников и схлопывание повторов букв."""
+    text = text.lower().translate(LOOKALIKES)
+    return REPEATED_CHARS.sub(r'\1', text)
+
+
+class Automaton:
+    """
+    Автомат Ахо — Корасик для поиска любого из слов за один проход.
+
+    Время проверки зависит от длины текста, а не от размера словаря.
+    """
+
+    def __init__(self, words):
+        self.transitions = [{}]
+        self.fail = [0]
+        self.terminal = [False]
+        for word in words:
+            self._add(word)
+        self._link()
+
+    def _add(self, word):
+        state = 0
+        for char in word:
+            next_state = self.transitions[state].get(char)
+            if next_state is None:
+                next_state = len(self.transitions)
+                self.transitions[state][char] = next_state
+                self.transitions.append({})
+                self.fail.append(0)
+                self.terminal.append(False)
+            state = next_state
+        self.terminal[state] = True
+
+    def _link(self):
+        queue = deque(self.transitions[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.transitions[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.transitions[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.transitions[fallback].get(
+                    char, 0
+                )
+                if self.terminal[self.fail[next_state]]:
+                    self.terminal[next_state] = True
+
+    def search(self, text):
+        """Есть ли в тексте хотя бы одно слово из словаря."""
+        transitions, fail, terminal = (
+            self.transitions, self.fail, self.terminal
+        )
+        state = 0
+        for char in text:
+            while state and char not in transitions[state]:
+                state = fail[state]
+            state = transitions[state].get(char, 0)
+            if terminal[state]:
+                return True
+        return False
+
+
+class ProfanityFilter:
+    """
+    Фильтр запрещённых слов со словарём из кода и из файла.
+
+    Файл перечитывается без перезапуска воркеров: не чаще раза в
+    reload_interval секунд проверяется время его изменения, и при
+    изменении автомат строится заново и подменяется целиком.
+    """
+
+    def __init__(self, words=(), path=None, reload_interval=5):
+        self.words = tuple(words)
+        self.path = path
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._checked = 0.0
+        self._automaton = self._build()
+
+    def _read_file(self):
+        try:
+            with open(self.path, encoding='utf-8') as file:
+                return [
+                    line.strip() for line in file
+                    if line.strip() and not line.startswith('#')
+                ]
+        except FileNotFoundError:
+            return []
+
+    def _file_mtime(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _build(self):
+        words = list(self.words)
+        if self.path:
+            self._mtime = self._file_mtime()
+            words.extend(self._read_file())
+        return Automaton({normalize(word) for word in words if word})
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if not self.path or now - self._checked < self.reload_interval:
+            return
+        with self._lock:
+            if now - self._checked < self.reload_interval:
+                return
+            self._checked = now
+            if self._file_mtime() != self._mtime:
+                self._automaton = self._build()
+
+    def contains(self, text):
+        self._maybe_reload()
+        return self._automaton.search(normalize(text))
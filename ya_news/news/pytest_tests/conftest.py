@@ -2,12 +2,33 @@ from datetime import timedelta
 
 import pytest
 from django.conf import settings
+from django.core.cache import cache, caches
 from django.test.client import Client
 from django.utils import timezone
 
+from news.compression import reset_compression_stats
 from news.models import Comment, News
 
 
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """
+    Кеш не переживает откат базы между тестами, очищаем его.
+
+    Кеш сессий и пользователей тоже: id пользователей повторяются.
+    Счётчики сжатия процесса обнуляются вместе с кешем.
+    """
+    cache.clear()
+    caches['sessions'].clear()
+    reset_compression_stats()
+
+
+@pytest.fixture(autouse=True)
+def enforce_query_budgets(settings):
+    """Превышение QUERY_BUDGETS любым маршрутом роняет тест."""
+    settings.QUERY_BUDGET_ENFORCE = True
+
+
 @pytest.fixture
 def author(django_user_model):
     return django_user_model.objects.create(username='Автор')
@@ -1,8 +1,21 @@
+import json
+from http import HTTPStatus
+
 import pytest
+from asgiref.sync import async_to_sync
 from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.asgi import get_asgi_application
+from django.core.cache import cache
+from django.db import connection
 from django.urls import reverse
 
+from news import async_views
+from news.cache import home_cache_stats
 from news.forms import CommentForm
+from news.management.commands.bench_http import asgi_request
+from news.models import Comment, News
+from news.pagination import encode_values
 
 pytestmark = pytest.mark.django_db
 
@@ -74,3 +87,280 @@ def test_authorized_client_has_form(author_client, news):
     response = author_client.get(detail_url)
     assert 'form' in response.context
     assert isinstance(response.context['form'], CommentForm)
+
+
+@pytest.mark.usefixtures('list_comments')
+def test_home_page_comment_count(client, news, django_assert_num_queries):
+    """
+    Количество комментариев на главной берётся из News.comment_count.
+
+    Число запросов не зависит от количества комментариев.
+    """
+    home_url = reverse('news:home')
+    with django_assert_num_queries(1):
+        response = client.get(home_url)
+    assert f'Комментариев: {news.comment_set.count()}' in (
+        response.content.decode()
+    )
+
+
+@pytest.mark.usefixtures('list_comments')
+def test_comments_keyset_pagination(client, news, settings):
+    """
+    Комментарии отдаются страницами по курсору ?after=.
+
+    Обход всех страниц возвращает каждый комментарий ровно один раз
+    в хронологическом порядке.
+    """
+    settings.COMMENTS_COUNT_ON_PAGE = 3
+    detail_url = reverse('news:detail', args=(news.id,))
+    response = client.get(detail_url)
+    seen = []
+    while True:
+        page = response.context['comments']
+        assert len(page) <= settings.COMMENTS_COUNT_ON_PAGE
+        seen.extend(page)
+        if not page.has_next:
+            break
+        response = client.get(detail_url, {'after': page.next_cursor})
+    assert seen == list(news.comment_set.order_by('created', 'id'))
+
+
+def test_comments_invalid_cursor(client, news):
+    """Некорректный курсор комментариев приводит к ошибке 404."""
+    detail_url = reverse('news:detail', args=(news.id,))
+    response = client.get(detail_url, {'after': 'не-курсор'})
+    assert response.status_code == HTTPStatus.NOT_FOUND
+
+
+@pytest.mark.parametrize(
+    'values', ([123, 1], [None, 1], ['2020-01-01T00:00:00', 2 ** 64])
+)
+def test_comments_cursor_with_wrong_values(client, news, values):
+    """Курсор со значениями не того типа приводит к ошибке 404."""
+    detail_url = reverse('news:detail', args=(news.id,))
+    response = client.get(detail_url, {'after': encode_values(values)})
+    assert response.status_code == HTTPStatus.NOT_FOUND
+
+
+@pytest.mark.parametrize(
+    'values', ([-1.0, 2 ** 70], [float('nan'), 1], [-1.0, True])
+)
+def test_search_cursor_with_wrong_values(client, values):
+    """Курсор поиска вне диапазона SQLite или с NaN даёт 404."""
+    response = client.get(reverse('news:search'), {
+        'q': 'новость', 'after': encode_values(values)
+    })
+    assert response.status_code == HTTPStatus.NOT_FOUND
+
+
+@pytest.mark.parametrize('values', ([None, 1], [{}, 1]))
+def test_api_cursor_with_wrong_values(client, values):
+    """Некорректные значения курсора в API дают ответ 400."""
+    response = client.get(
+        reverse('news:api_news_list'), {'after': encode_values(values)}
+    )
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+
+
+@pytest.mark.usefixtures('list_news')
+def test_archive_keyset_pagination(client, settings):
+    """
+    Архив позволяет дойти до всех новостей, от свежих к старым.
+
+    Страницы переключаются по курсору, а не по номеру страницы.
+    """
+    settings.NEWS_COUNT_ON_ARCHIVE_PAGE = 4
+    archive_url = reverse('news:archive')
+    response = client.get(archive_url)
+    seen = []
+    while True:
+        page = response.context['object_list']
+        seen.extend(page)
+        if not page.has_next:
+            break
+        response = client.get(archive_url, {'after': page.next_cursor})
+    assert seen == list(News.objects.order_by('-date', '-id'))
+
+
+def test_home_page_fragment_cache(client, news, django_assert_num_queries):
+    """
+    Список новостей главной страницы кешируется.
+
+    Повторный запрос обходится без обращения к базе,
+    а изменение новости сбрасывает кеш.
+    """
+    home_url = reverse('news:home')
+    client.get(home_url)
+    with django_assert_num_queries(0):
+        client.get(home_url)
+    assert home_cache_stats()['hits'] == 1
+    news.title = 'Новый заголовок'
+    news.save()
+    response = client.get(home_url)
+    assert news.title in response.content.decode()
+
+
+def test_detail_conditional_get(author, client, news):
+    """
+    Страница новости отвечает 304, пока новость не изменилась.
+
+    Новый комментарий меняет ETag страницы.
+    """
+    detail_url = reverse('news:detail', args=(news.id,))
+    etag = client.get(detail_url)['ETag']
+    response = client.get(detail_url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+    Comment.objects.create(news=news, author=author, text='Текст')
+    response = client.get(detail_url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == HTTPStatus.OK
+
+
+def test_detail_etag_changes_after_relogin(author, client, news):
+    """
+    После повторного входа страница новости не отвечает 304.
+
+    Вход меняет CSRF-токен, и форма со старым токеном дала бы 403.
+    """
+    detail_url = reverse('news:detail', args=(news.id,))
+    client.force_login(author)
+    # Первый ответ выдаёт CSRF-cookie, второй строит ETag уже с ней.
+    client.get(detail_url)
+    etag = client.get(detail_url)['ETag']
+    response = client.get(detail_url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+    client.logout()
+    client.force_login(author)
+    response = client.get(detail_url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == HTTPStatus.OK
+    assert 'csrfmiddlewaretoken' in response.content.decode()
+
+
+def read_json(response):
+    if response.streaming:
+        return json.loads(b''.join(response.streaming_content))
+    return response.json()
+
+
+@pytest.mark.usefixtures('list_news')
+def test_api_news_list(client):
+    """
+    API списка новостей отдаёт выбранные поля страницами по курсору.
+
+    Первая страница совпадает с новостями на главной.
+    """
+    api_url = reverse('news:api_news_list')
+    data = read_json(client.get(api_url, {'fields': 'id,title'}))
+    home_news = client.get(reverse('news:home')).context['object_list']
+    assert [row['id'] for row in data['results']] == [
+        news.id for news in home_news
+    ]
+    assert set(data['results'][0]) == {'id', 'title'}
+    data = read_json(client.get(api_url, {'after': data['next']}))
+    assert len(data['results']) == 1
+    assert data['next'] is None
+
+
+@pytest.mark.usefixtures('list_comments')
+def test_api_comments(client, news, author):
+    """API комментариев отдаёт их в хронологическом порядке."""
+    api_url = reverse('news:api_comments', args=(news.id,))
+    data = read_json(client.get(api_url, {'limit': 4}))
+    rows = data['results']
+    assert len(rows) == 4
+    assert rows[0]['author'] == author.username
+    assert [row['id'] for row in rows] == list(
+        news.comment_set.order_by('created', 'id').values_list(
+            'id', flat=True
+        )[:4]
+    )
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.usefixtures('list_comments')
+def test_api_comments_under_asgi(client, news):
+    """Под ASGI API отдаёт ту же страницу, что и под WSGI."""
+    api_url = reverse('news:api_comments', args=(news.id,))
+    body = []
+    status = async_to_sync(asgi_request)(get_asgi_application(), api_url, body)
+    assert status == HTTPStatus.OK
+    assert json.loads(b''.join(body)) == read_json(client.get(api_url))
+
+
+@pytest.mark.parametrize(
+    'params',
+    ({'fields': 'password'}, {'after': 'не-курсор'}, {'limit': 'много'}),
+)
+def test_api_bad_request(client, news, params):
+    """Неизвестные поля и некорректные параметры дают ошибку 400."""
+    response = client.get(reverse('news:api_news_list'), params)
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+
+
+def test_api_news_detail(client, news):
+    """API новости отдаёт её поля."""
+    url = reverse('news:api_news_detail', args=(news.id,))
+    data = read_json(client.get(url, {'fields': 'title,comment_count'}))
+    assert data == {'title': news.title, 'comment_count': 0}
+
+
+def test_long_news_text_is_compressed(client):
+    """
+    Длинный текст новости хранится сжатым и распаковывается лениво.
+
+    API и страница новости отдают исходный текст.
+    """
+    text = 'Строка журнала\n' * 1000
+    news = News.objects.create(title='Журнал', text=text)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT typeof(text), length(text) FROM news_news WHERE id = %s',
+            (news.id,)
+        )
+        kind, size = cursor.fetchone()
+    assert kind == 'blob'
+    assert size < len(text) / 10
+    news = News.objects.get(pk=news.pk)
+    assert isinstance(news.__dict__['text'], bytes)
+    assert news.text == text
+    url = reverse('news:api_news_detail', args=(news.id,))
+    assert read_json(client.get(url, {'fields': 'text'})) == {'text': text}
+    response = client.get(reverse('news:detail', args=(news.id,)))
+    assert response.context['object'].text == text
+
+
+@pytest.mark.usefixtures('list_comments')
+def test_async_news_detail_matches_sync(client, news, rf, settings):
+    """
+    Асинхронная страница новости совпадает с синхронной.
+
+    Валидаторы те же, поэтому ETag синхронного ответа даёт 304.
+    """
+    settings.ASYNC_DB_POOL_SIZE = 0
+    url = reverse('news:detail', args=(news.id,))
+    expected = client.get(url)
+
+    def get(**headers):
+        request = rf.get(url, **headers)
+        request.user = AnonymousUser()
+        return async_to_sync(async_views.news_detail)(request, pk=news.id)
+
+    response = get()
+    assert response.content == expected.content
+    assert response['ETag'] == expected['ETag']
+    assert response['Last-Modified'] == expected['Last-Modified']
+    response = get(HTTP_IF_NONE_MATCH=expected['ETag'])
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.usefixtures('list_news')
+def test_async_home_page_uses_db_pool(client, rf, settings):
+    """Главная через пул потоков совпадает с синхронной."""
+    expected = client.get(reverse('news:home'))
+    cache.clear()
+    settings.ASYNC_DB_POOL_SIZE = 2
+    request = rf.get(reverse('news:home'))
+    request.user = AnonymousUser()
+    response = async_to_sync(async_views.news_list)(request)
+    assert response.content == expected.content
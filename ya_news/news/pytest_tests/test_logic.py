@@ -1,11 +1,36 @@
+import asyncio
+import gzip
+import importlib
+import os
+import sqlite3
+import sys
 from http import HTTPStatus
+from io import StringIO
+from unittest import mock
 
 import pytest
-from django.urls import reverse
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
 from pytest_django.asserts import assertFormError, assertRedirects
 
+from news import db
+from news.compression import STATS_KEYS, compress, compression_stats
 from news.forms import BAD_WORDS, WARNING
-from news.models import Comment
+from news.ingest import CommentIngestor, IngestError
+from news.management.commands.bench_templates import build_engine
+from news.middleware import (
+    PIN_COOKIE, CompressionMiddleware, QueryCountMiddleware,
+    ReplicaMiddleware
+)
+from news.models import Comment, News
+from news.profanity import ProfanityFilter
+from news.router import ReplicaRouter
+from news.template_cache import template_names, warm_up
 
 
 @pytest.mark.django_db
@@ -108,3 +133,440 @@ def test_user_cant_edit_comment_of_another_user(
     assert response.status_code == HTTPStatus.NOT_FOUND
     comment.refresh_from_db()
     assert comment.text != form_data['text']
+
+
+def test_comment_count_follows_create_and_delete(
+        author, author_client, news
+):
+    """Счётчик комментариев новости меняется при создании и удалении."""
+    detail_url = reverse('news:detail', args=(news.id,))
+    author_client.post(detail_url, data={'text': 'Текст комментария'})
+    news.refresh_from_db()
+    assert news.comment_count == 1
+    comment = Comment.objects.get()
+    author_client.delete(reverse('news:delete', args=(comment.id,)))
+    news.refresh_from_db()
+    assert news.comment_count == 0
+
+
+def test_comment_count_after_bulk_operations(author, news):
+    """Счётчик учитывает bulk_create и удаление через QuerySet."""
+    Comment.objects.bulk_create(
+        Comment(news=news, author=author, text=f'Текст {index}')
+        for index in range(5)
+    )
+    news.refresh_from_db()
+    assert news.comment_count == 5
+    first_ids = Comment.objects.values_list('pk', flat=True)[:2]
+    Comment.objects.filter(pk__in=list(first_ids)).delete()
+    news.refresh_from_db()
+    assert news.comment_count == 3
+
+
+@pytest.mark.django_db
+def test_recount_comments_command(client, news, list_comments):
+    """
+    Команда recount_comments восстанавливает счётчики.
+
+    Главная страница из кеша показывает уже исправленное число.
+    """
+    home_url = reverse('news:home')
+    News.objects.update(comment_count=0)
+    assert 'Комментариев' not in client.get(home_url).content.decode()
+    call_command('recount_comments', stdout=StringIO())
+    news.refresh_from_db()
+    assert news.comment_count == Comment.objects.filter(news=news).count()
+    response = client.get(home_url)
+    assert f'Комментариев: {news.comment_count}' in response.content.decode()
+
+
+@pytest.mark.parametrize(
+    'text',
+    ('Ну ты и РЕДИСКА', 'ты рeдиска', 'редииииска!', 'нeгoдяй'),
+)
+def test_user_cant_hide_bad_words(author_client, news, text):
+    """
+    Запрещённые слова находятся и в замаскированном виде.
+
+    Регистр, латинские буквы-двойники и повторы букв не помогают.
+    """
+    detail_url = reverse('news:detail', args=(news.id,))
+    response = author_client.post(detail_url, data={'text': text})
+    assertFormError(response, form='form', field='text', errors=WARNING)
+    assert Comment.objects.count() == 0
+
+
+def test_profanity_filter_reloads_file(tmp_path):
+    """Словарь из файла перечитывается после его изменения."""
+    path = tmp_path / 'bad_words.txt'
+    path.write_text('# словарь\nзлодей\n', encoding='utf-8')
+    profanity_filter = ProfanityFilter(BAD_WORDS, path, reload_interval=0)
+    assert profanity_filter.contains('Вот злодей')
+    assert not profanity_filter.contains('Вот плут')
+    path.write_text('плут\n', encoding='utf-8')
+    os.utime(path, ns=(0, 0))
+    assert profanity_filter.contains('Вот плут')
+    assert not profanity_filter.contains('Вот злодей')
+    assert profanity_filter.contains(f'Вот {BAD_WORDS[0]}')
+
+
+def test_search_follows_changes(author, client, news):
+    """
+    Поиск находит новости и комментарии и следит за их изменениями.
+
+    Индекс обновляется при создании, массовом создании и удалении.
+    """
+    search_url = reverse('news:search')
+    comment = Comment.objects.create(
+        news=news, author=author, text='Обсуждаем кабачки'
+    )
+    Comment.objects.bulk_create([
+        Comment(news=news, author=author, text='Ещё про кабачки')
+    ])
+    response = client.get(search_url, {'q': 'кабач'})
+    hits = response.context['object_list']
+    assert {hit.object for hit in hits} == set(
+        Comment.objects.filter(text__contains='кабачки')
+    )
+    assert '<mark>' in hits[0].snippet
+    response = client.get(search_url, {'q': news.title})
+    assert [hit.object for hit in response.context['object_list']] == [news]
+    comment.delete()
+    response = client.get(search_url, {'q': 'обсуждаем'})
+    assert not response.context['object_list']
+
+
+def test_news_delete_cleans_up_once(author, news, list_comments):
+    """
+    Удаление новости не обновляет индекс по каждому комментарию.
+
+    Новость и её комментарии уходят из индекса одним запросом по rowid,
+    а удаление комментариев других новостей обрабатывается как раньше.
+    """
+    other = News.objects.create(title='Кабачки', text='Текст')
+    comment = Comment.objects.create(
+        news=other, author=author, text='Про кабачки'
+    )
+    with CaptureQueriesContext(connection) as queries:
+        news.delete()
+    assert len(queries) <= 6
+    index_deletes = [
+        query['sql'] for query in queries
+        if query['sql'].startswith('DELETE FROM news_search')
+    ]
+    assert len(index_deletes) == 1
+    assert 'WHERE rowid IN' in index_deletes[0]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT count(*) FROM news_search WHERE news_id = %s', (news.pk,)
+        )
+        assert cursor.fetchone() == (0,)
+    comment.delete()
+    other.refresh_from_db()
+    assert other.comment_count == 0
+
+
+@pytest.mark.django_db
+def test_search_pagination_and_rebuild(client, list_news, settings):
+    """Результаты поиска листаются курсором и переживают перестройку."""
+    settings.SEARCH_RESULTS_ON_PAGE = 4
+    call_command('rebuild_search_index', stdout=StringIO())
+    search_url = reverse('news:search')
+    response = client.get(search_url, {'q': 'новость'})
+    seen = []
+    while True:
+        page = response.context['object_list']
+        seen.extend(hit.object for hit in page)
+        if not page.has_next:
+            break
+        response = client.get(
+            search_url, {'q': 'новость', 'after': page.next_cursor}
+        )
+    assert sorted(seen, key=lambda news: news.pk) == list(
+        News.objects.order_by('pk')
+    )
+
+
+def test_comment_ingest_mode(author_client, news, settings, monkeypatch):
+    """
+    В режиме пакетной записи комментарий попадает в базу при сбросе.
+
+    Переполненная очередь отвечает 503 с заголовком Retry-After.
+    """
+    settings.COMMENT_INGEST = {
+        **settings.COMMENT_INGEST, 'ENABLED': True, 'DURABLE': False
+    }
+    ingestor = CommentIngestor(
+        batch_size=10, flush_interval=0, queue_size=1, put_timeout=0,
+        autostart=False,
+    )
+    monkeypatch.setattr('news.views.get_ingestor', lambda: ingestor)
+    detail_url = reverse('news:detail', args=(news.id,))
+    response = author_client.post(detail_url, data={'text': 'Первый'})
+    assertRedirects(response, f'{detail_url}#comments')
+    assert Comment.objects.count() == 0
+    response = author_client.post(detail_url, data={'text': 'Второй'})
+    assert response.status_code == HTTPStatus.SERVICE_UNAVAILABLE
+    assert 'Retry-After' in response
+    ingestor.flush_pending()
+    assert list(Comment.objects.values_list('text', flat=True)) == ['Первый']
+    news.refresh_from_db()
+    assert news.comment_count == 1
+
+
+@pytest.mark.django_db(transaction=True)
+def test_comment_ingest_thread(
+        author, author_client, news, settings, monkeypatch
+):
+    """
+    Фоновый поток записывает пакеты, и в режиме DURABLE запрос ждёт.
+
+    Некорректный комментарий не мешает записи остальных комментариев
+    пакета, а незаписанный комментарий возвращает форму с ошибкой.
+    """
+    settings.COMMENT_INGEST = {
+        **settings.COMMENT_INGEST, 'ENABLED': True, 'DURABLE': True
+    }
+    ingestor = CommentIngestor(
+        batch_size=10, flush_interval=0.2, queue_size=10, put_timeout=1,
+    )
+    monkeypatch.setattr('news.views.get_ingestor', lambda: ingestor)
+    detail_url = reverse('news:detail', args=(news.id,))
+    response = author_client.post(detail_url, data={'text': 'Первый'})
+    assertRedirects(response, f'{detail_url}#comments')
+    assert Comment.objects.filter(text='Первый').exists()
+    good = ingestor.submit(Comment(news=news, author=author, text='Второй'))
+    bad = ingestor.submit(
+        Comment(news_id=news.pk + 1000, author=author, text='Третий')
+    )
+    assert good.wait(5)
+    with pytest.raises(IngestError):
+        bad.wait(5)
+    assert set(Comment.objects.values_list('text', flat=True)) == {
+        'Первый', 'Второй'
+    }
+    monkeypatch.setattr(ingestor, 'submit', lambda comment: bad)
+    response = author_client.post(detail_url, data={'text': 'Четвёртый'})
+    assert response.status_code == HTTPStatus.OK
+    assertFormError(
+        response, 'form', None, 'Не удалось сохранить комментарий.'
+    )
+
+
+@pytest.mark.django_db
+def test_sqlite_connection_is_tuned(settings, monkeypatch):
+    """
+    К соединению применены SQLITE_PRAGMAS.
+
+    Сломанное постоянное соединение закрывается перед запросом.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA busy_timeout')
+        assert cursor.fetchone()[0] == settings.SQLITE_PRAGMAS['busy_timeout']
+    broken = sqlite3.connect(':memory:')
+    broken.close()
+    stale = mock.Mock(
+        vendor='sqlite', connection=broken, in_atomic_block=False,
+        settings_dict={'CONN_MAX_AGE': 60},
+    )
+    healthy = mock.Mock(
+        vendor='sqlite', connection=sqlite3.connect(':memory:'),
+        in_atomic_block=False, settings_dict={'CONN_MAX_AGE': 60},
+    )
+    monkeypatch.setattr(
+        db, 'connections', mock.Mock(all=lambda: [stale, healthy])
+    )
+    db.check_connections(sender=None)
+    stale.close.assert_called_once()
+    healthy.close.assert_not_called()
+
+
+def test_reads_go_to_replicas_until_user_writes(
+        client, author_client, news, settings, monkeypatch
+):
+    """
+    GET маршрутов из REPLICA_READ_VIEWS читает с реплик по кругу.
+
+    Фрагмент главной для кеша собирается по основной базе. После
+    отправки комментария пользователь читает с основной базы.
+    Реплики в тестах не подключены, поэтому запросы фактически
+    выполняются на основной базе, а выбор маршрутизатора записывается.
+    """
+    settings.REPLICA_DATABASES = ['replica1', 'replica2']
+    chosen = []
+    db_for_read = ReplicaRouter.db_for_read
+
+    def record(self, model, **hints):
+        chosen.append(db_for_read(self, model, **hints))
+        return 'default'
+
+    monkeypatch.setattr(ReplicaRouter, 'db_for_read', record)
+    monkeypatch.setattr(ReplicaRouter, 'lag', lambda self, alias: 0)
+    detail_url = reverse('news:detail', args=(news.id,))
+    client.get(reverse('news:home'))
+    assert set(chosen) == {'default'}
+    author_client.get(detail_url)
+    assert {'replica1', 'replica2'} <= set(chosen)
+    chosen.clear()
+    client.get(reverse('news:archive'))
+    assert set(chosen) == {'default'}
+    response = author_client.post(detail_url, data={'text': 'Текст'})
+    assert response.cookies[PIN_COOKIE]['max-age'] == (
+        settings.REPLICA_MAX_LAG + settings.REPLICA_LAG_CHECK_INTERVAL
+    )
+    chosen.clear()
+    author_client.get(detail_url)
+    assert set(chosen) == {'default'}
+    assert ReplicaRouter().db_for_read(News) == 'default'
+
+
+def test_session_and_user_come_from_cache(
+        author, author_client, news, settings
+):
+    """
+    Сессия и пользователь запроса читаются из кеша.
+
+    Смена пароля сбрасывает кеш пользователя, и старая сессия
+    перестаёт быть действительной.
+    """
+    detail_url = reverse('news:detail', args=(news.id,))
+    author_client.get(detail_url)
+    with CaptureQueriesContext(connection) as queries:
+        response = author_client.get(detail_url)
+    assert response.context['user'] == author
+    assert not [
+        query for query in queries
+        if 'FROM "django_session"' in query['sql']
+        or 'FROM "auth_user"' in query['sql']
+    ]
+    author.set_password('new-password')
+    author.save()
+    # Сброс сессии - разовые запросы сверх бюджета страницы.
+    settings.QUERY_BUDGET_ENFORCE = False
+    response = author_client.get(detail_url)
+    assert not response.context['user'].is_authenticated
+
+
+def load_prod_settings(monkeypatch, memcached=None):
+    """Модуль yanews.settings_prod, импортированный заново."""
+    monkeypatch.setenv('DJANGO_SECRET_KEY', 'secret')
+    if memcached:
+        monkeypatch.setenv('DJANGO_MEMCACHED_LOCATION', memcached)
+    else:
+        monkeypatch.delenv('DJANGO_MEMCACHED_LOCATION', raising=False)
+    monkeypatch.delitem(sys.modules, 'yanews.settings_prod', raising=False)
+    return importlib.import_module('yanews.settings_prod')
+
+
+def test_prod_caches_are_shared(monkeypatch):
+    """
+    В продакшене сессии, пользователи и главная кешируются в memcached.
+
+    Без общего кеша сессии и пользователи читаются из базы, а
+    фрагмент главной не кешируется.
+    """
+    prod = load_prod_settings(monkeypatch, memcached='a:11211,b:11211')
+    for alias in ('default', 'sessions'):
+        assert prod.CACHES[alias]['LOCATION'] == ['a:11211', 'b:11211']
+    assert prod.SESSION_ENGINE.endswith('cached_db')
+    assert prod.AUTHENTICATION_BACKENDS == ['news.auth.CachedModelBackend']
+    prod = load_prod_settings(monkeypatch)
+    assert prod.CACHES['default']['BACKEND'].endswith('DummyCache')
+    assert prod.SESSION_ENGINE == 'django.contrib.sessions.backends.db'
+    assert prod.AUTHENTICATION_BACKENDS == [
+        'django.contrib.auth.backends.ModelBackend'
+    ]
+
+
+def test_template_warm_up_compiles_all_templates():
+    """Прогрев кладёт в кеш загрузчика cached все шаблоны из templates/."""
+    engine = build_engine(cached=True)
+    count = warm_up(engine)
+    names = template_names(engine)
+    assert 'news/detail.html' in names
+    assert count == len(names)
+    assert len(engine.template_loaders[0].get_template_cache) == count
+
+
+@pytest.mark.django_db
+def test_responses_are_compressed(client, news, list_comments, settings):
+    """
+    Страница новости и потоковый ответ API сжимаются gzip.
+
+    Сжатая страница берётся из кеша при повторном запросе, короткие
+    ответы и клиенты без gzip получают тело как есть.
+    """
+    detail_url = reverse('news:detail', args=(news.id,))
+    plain = client.get(detail_url)
+    assert 'Content-Encoding' not in plain
+    response = client.get(detail_url, HTTP_ACCEPT_ENCODING='gzip')
+    assert response['Content-Encoding'] == 'gzip'
+    assert response['ETag'] == 'W/' + plain['ETag']
+    assert 'Accept-Encoding' in response['Vary']
+    assert 'gzip;dur=' in response['Server-Timing']
+    assert gzip.decompress(response.content) == plain.content
+    assert len(response.content) < len(plain.content) / 3
+    client.get(detail_url, HTTP_ACCEPT_ENCODING='gzip')
+    assert compression_stats()['cached'] == 1
+    api_url = reverse('news:api_news_list')
+    plain = b''.join(client.get(api_url).streaming_content)
+    response = client.get(api_url, HTTP_ACCEPT_ENCODING='gzip, br')
+    assert response['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(b''.join(response.streaming_content)) == plain
+    stats = compression_stats()
+    assert stats['responses'] == 3
+    assert 0 < stats['ratio'] < 1
+    response = client.get(
+        reverse('news:api_news_detail', args=(news.id,)),
+        HTTP_ACCEPT_ENCODING='gzip',
+    )
+    assert len(response.content) < settings.COMPRESSION_MIN_SIZE
+    assert 'Content-Encoding' not in response
+
+
+def test_compression_stats_are_flushed_in_batches(settings):
+    """
+    Счётчики сжатия уходят в общий кеш раз в интервал, а не на
+    каждый ответ; compression_stats() учитывает и ещё не перенесённые.
+    """
+    settings.COMPRESSION_STATS_FLUSH_INTERVAL = 60
+    body = 'Новость '.encode() * 500
+    compress(body)
+    compress(body)
+    assert cache.get(STATS_KEYS['responses']) is None
+    assert compression_stats()['responses'] == 2
+    assert cache.get(STATS_KEYS['responses']) == 2
+    settings.COMPRESSION_STATS_FLUSH_INTERVAL = 0
+    compress(body)
+    assert cache.get(STATS_KEYS['responses']) == 3
+
+
+def test_middlewares_run_in_async_chain(rf, settings, monkeypatch):
+    """
+    В асинхронной цепочке middleware проекта сами остаются корутинами.
+
+    Django не оборачивает их в sync_to_async, а чтение маршрутов из
+    REPLICA_READ_VIEWS по-прежнему идёт на реплики.
+    """
+    settings.REPLICA_DATABASES = ['replica1']
+    settings.REPLICA_READ_VIEWS = ('news:home',)
+    monkeypatch.setattr(ReplicaRouter, 'lag', lambda self, alias: 0)
+    chosen = []
+
+    async def view(request):
+        request.resolver_match = resolve(reverse('news:home'))
+        chosen.append(ReplicaRouter().db_for_read(News))
+        return HttpResponse('Новость ' * 200)
+
+    handler = view
+    for middleware in (
+            CompressionMiddleware, ReplicaMiddleware, QueryCountMiddleware
+    ):
+        handler = middleware(handler)
+        assert asyncio.iscoroutinefunction(handler)
+    request = rf.get('/', HTTP_ACCEPT_ENCODING='gzip')
+    response = async_to_sync(handler)(request)
+    assert chosen == ['replica1']
+    assert gzip.decompress(response.content) == ('Новость ' * 200).encode()
+    response = async_to_sync(handler)(rf.post('/'))
+    assert PIN_COOKIE in response.cookies
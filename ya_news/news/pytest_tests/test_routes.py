@@ -4,12 +4,16 @@ import pytest
 from django.urls import reverse
 from pytest_django.asserts import assertRedirects
 
+from news.middleware import QueryBudgetExceeded
+
 
 @pytest.mark.django_db
 @pytest.mark.parametrize(
     'name, news_obj',
     (
         ('news:home', None),
+        ('news:archive', None),
+        ('news:search', None),
         ('news:detail', pytest.lazy_fixture('news')),
         ('users:login', None),
         ('users:logout', None),
@@ -78,3 +82,20 @@ def test_redirects(client, name, comment_obj):
     expected_url = f'{login_url}?next={url}'
     response = client.get(url)
     assertRedirects(response, expected_url)
+
+
+@pytest.mark.django_db
+def test_query_budget_is_enforced(client, news, settings):
+    """Маршрут, превысивший бюджет запросов, роняет тест."""
+    settings.QUERY_BUDGETS = {**settings.QUERY_BUDGETS, 'news:detail': 1}
+    with pytest.raises(QueryBudgetExceeded):
+        client.get(reverse('news:detail', args=(news.id,)))
+
+
+@pytest.mark.django_db
+def test_query_budget_counts_streaming_response(client, news, settings):
+    """Запросы при чтении потокового ответа входят в бюджет маршрута."""
+    settings.QUERY_BUDGETS = {**settings.QUERY_BUDGETS, 'news:api_comments': 1}
+    response = client.get(reverse('news:api_comments', args=(news.id,)))
+    with pytest.raises(QueryBudgetExceeded):
+        b''.join(response.streaming_content)
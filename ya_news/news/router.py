@@ -0,0 +1,136 @@
+import itertools
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Явный выбор базы для чтения в текущем контексте: True - реплики,
+# False - основная база, None - решает текущий запрос.
+use_replicas = ContextVar('use_replicas', default=None)
+# Запрос, чтение которого можно отправить на реплики, если его маршрут
+# входит в REPLICA_READ_VIEWS. Выставляется ReplicaMiddleware, поэтому
+# команды, сигналы и остальные представления читают с основной базы.
+replica_request = ContextVar('replica_request', default=None)
+
+
+@contextmanager
+def read_from_replicas():
+    token = use_replicas.set(True)
+    try:
+        yield
+    finally:
+        use_replicas.reset(token)
+
+
+@contextmanager
+def read_from_primary():
+    """
+    Чтение с основной базы, даже на маршрутах из REPLICA_READ_VIEWS.
+
+    Так собираются значения общего кеша: отстающая реплика положила
+    бы в него устаревшие данные уже после сброса кеша записью.
+    """
+    token = use_replicas.set(False)
+    try:
+        yield
+    finally:
+        use_replicas.reset(token)
+
+
+def reads_from_replicas():
+    """
+    Чтение текущего контекста идёт на реплики.
+
+    Маршрут запроса известен только после разбора URL, поэтому он
+    проверяется при каждом чтении, а не в начале запроса.
+    """
+    forced = use_replicas.get()
+    if forced is not None:
+        return forced
+    request = replica_request.get()
+    match = request.resolver_match if request is not None else None
+    return match is not None and (
+        match.view_name in settings.REPLICA_READ_VIEWS
+    )
+
+
+def sqlite_lag(alias):
+    """
+    Отставание копии SQLite от основной базы в секундах.
+
+    Копия файла не реплицируется, поэтому отставание оценивается
+    по времени изменения файлов базы и её журнала WAL.
+    """
+    def modified(name):
+        return max(
+            (os.path.getmtime(path) for path in (name, f'{name}-wal')
+             if os.path.exists(path)),
+            default=0,
+        )
+
+    primary = connections[DEFAULT_DB_ALIAS].settings_dict['NAME']
+    replica = connections[alias].settings_dict['NAME']
+    return max(modified(primary) - modified(replica), 0)
+
+
+class ReplicaRouter:
+    """
+    Чтение с реплик из REPLICA_DATABASES, запись - в основную базу.
+
+    Реплика выбирается по кругу (REPLICA_SELECTION = 'round_robin')
+    или с наименьшим отставанием ('lag'); в обоих режимах реплики,
+    отставшие больше чем на REPLICA_MAX_LAG секунд, пропускаются.
+    """
+
+    def __init__(self):
+        self.counter = itertools.count()
+        self.lags = {}
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.REPLICA_DATABASES
+        if not replicas or not reads_from_replicas():
+            return DEFAULT_DB_ALIAS
+        if settings.REPLICA_SELECTION == 'lag':
+            return self.least_lagging(replicas)
+        return self.next_fresh(replicas)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        """Реплики - копии основной базы, связи между ними допустимы."""
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        """Реплики получают схему копированием, а не миграциями."""
+        return db == DEFAULT_DB_ALIAS
+
+    def lag(self, alias):
+        """Отставание реплики, перепроверяется не чаще раза в интервал."""
+        checked, lag = self.lags.get(alias, (None, None))
+        now = time.monotonic()
+        if checked is None or (
+                now - checked > settings.REPLICA_LAG_CHECK_INTERVAL
+        ):
+            lag = (
+                sqlite_lag(alias) if connections[alias].vendor == 'sqlite'
+                else 0
+            )
+            self.lags[alias] = (now, lag)
+        return lag
+
+    def least_lagging(self, replicas):
+        lag, alias = min((self.lag(alias), alias) for alias in replicas)
+        return alias if lag <= settings.REPLICA_MAX_LAG else DEFAULT_DB_ALIAS
+
+    def next_fresh(self, replicas):
+        """Следующая по кругу реплика, отставшая не больше допустимого."""
+        start = next(self.counter)
+        for index in range(len(replicas)):
+            alias = replicas[(start + index) % len(replicas)]
+            if self.lag(alias) <= settings.REPLICA_MAX_LAG:
+                return alias
+        return DEFAULT_DB_ALIAS
@@ -0,0 +1,178 @@
+import math
+import re
+
+from django.db import connection
+from django.utils.html import escape
+
+from .db import SQL_INTEGER_MAX, SQL_INTEGER_MIN
+from .fields import SQL_FUNCTION
+from .pagination import (
+    InvalidCursor, KeysetPage, decode_values, encode_values
+)
+
+# Полнотекстовый индекс SQLite FTS5 по новостям и комментариям,
+# таблица создаётся миграцией 0006_news_search.
+# rowid кодирует тип и id объекта, поэтому обновление и удаление
+# записи индекса — поиск по первичному ключу, а не просмотр таблицы.
+TABLE = 'news_search'
+NEWS, COMMENT = 0, 1
+KINDS = 2
+MARK_START, MARK_END = '\x02', '\x03'
+TOKEN = re.compile(r'\w+')
+# Старые сборки SQLite принимают не больше 999 параметров в запросе.
+DELETE_BATCH_SIZE = 500
+
+REBUILD_SQL = (
+    f'DELETE FROM {TABLE}',
+    f'INSERT INTO {TABLE} (rowid, title, text, news_id) '
+    f'SELECT id * {KINDS} + {NEWS}, title, {SQL_FUNCTION}(text), id '
+    f'FROM news_news',
+    f'INSERT INTO {TABLE} (rowid, title, text, news_id) '
+    f"SELECT id * {KINDS} + {COMMENT}, '', text, news_id FROM news_comment",
+)
+SEARCH_SQL = (
+    f'SELECT rowid, rank, news_id, '
+    f"snippet({TABLE}, -1, '{MARK_START}', '{MARK_END}', '…', 16) "
+    f'FROM {TABLE} WHERE {TABLE} MATCH %s{{after}} '
+    f'ORDER BY rank, rowid LIMIT %s'
+)
+AFTER_SQL = ' AND (rank > %s OR (rank = %s AND rowid > %s))'
+
+
+def is_available():
+    """Индекс есть только у SQLite, на других СУБД поиск выключен."""
+    return connection.vendor == 'sqlite'
+
+
+def _rowid(kind, pk):
+    return pk * KINDS + kind
+
+
+def _upsert(rows):
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'DELETE FROM {TABLE} WHERE rowid = %s',
+            [(row[0],) for row in rows]
+        )
+        cursor.executemany(
+            f'INSERT INTO {TABLE} (rowid, title, text, news_id) '
+            'VALUES (%s, %s, %s, %s)',
+            rows
+        )
+
+
+def index_news(news):
+    if is_available():
+        _upsert([(_rowid(NEWS, news.pk), news.title, news.text, news.pk)])
+
+
+def index_comments(comments):
+    if is_available():
+        _upsert([
+            (_rowid(COMMENT, comment.pk), '', comment.text, comment.news_id)
+            for comment in comments
+        ])
+
+
+def unindex(kind, pk):
+    if is_available():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {TABLE} WHERE rowid = %s', (_rowid(kind, pk),)
+            )
+
+
+def unindex_news(news_id, comment_ids=()):
+    """
+    Удаляет из индекса новость вместе с её комментариями.
+
+    Столбец news_id в FTS5 не индексируется, поэтому записи удаляются
+    по rowid, пачками, чтобы не упереться в лимит параметров SQLite.
+    """
+    if not is_available():
+        return
+    rowids = [_rowid(NEWS, news_id)]
+    rowids.extend(_rowid(COMMENT, pk) for pk in comment_ids)
+    with connection.cursor() as cursor:
+        for start in range(0, len(rowids), DELETE_BATCH_SIZE):
+            batch = rowids[start:start + DELETE_BATCH_SIZE]
+            cursor.execute(
+                f'DELETE FROM {TABLE} WHERE rowid IN '
+                f'({", ".join(["%s"] * len(batch))})',
+                batch
+            )
+
+
+def rebuild():
+    """Полностью перестраивает индекс средствами SQL, без моделей."""
+    with connection.cursor() as cursor:
+        for sql in REBUILD_SQL:
+            cursor.execute(sql)
+
+
+def to_match_query(query):
+    """
+    Превращает ввод пользователя в запрос FTS5.
+
+    Каждое слово ищется как префикс, а синтаксис FTS5 экранируется,
+    чтобы кавычки и операторы в запросе не приводили к ошибкам.
+    """
+    return ' '.join(f'"{token}"*' for token in TOKEN.findall(query))
+
+
+def highlight(snippet):
+    return escape(snippet).replace(
+        MARK_START, '<mark>'
+    ).replace(MARK_END, '</mark>')
+
+
+class SearchHit:
+    """Найденная новость или комментарий с фрагментом текста."""
+
+    def __init__(self, rowid, news_id, snippet):
+        self.kind = rowid % KINDS
+        self.pk = rowid // KINDS
+        self.news_id = news_id
+        self.snippet = highlight(snippet)
+        self.news = None
+        self.object = None
+
+    @property
+    def is_comment(self):
+        return self.kind == COMMENT
+
+
+def search(query, size, cursor=None):
+    """
+    Страница результатов, отсортированных по релевантности (bm25).
+
+    Курсор хранит ранг и rowid последнего результата, поэтому
+    следующая страница не пересчитывает уже показанные строки.
+    """
+    match = to_match_query(query)
+    if not match or not is_available():
+        return KeysetPage([], None)
+    after, params = '', [match]
+    if cursor:
+        rank, rowid = decode_values(cursor, 2)
+        if (
+            not isinstance(rank, float) or not math.isfinite(rank)
+            or not isinstance(rowid, int) or isinstance(rowid, bool)
+            or not SQL_INTEGER_MIN <= rowid <= SQL_INTEGER_MAX
+        ):
+            raise InvalidCursor(cursor)
+        after, params = AFTER_SQL, [match, rank, rank, rowid]
+    with connection.cursor() as db_cursor:
+        db_cursor.execute(
+            SEARCH_SQL.format(after=after), params + [size + 1]
+        )
+        rows = db_cursor.fetchall()
+    next_cursor = None
+    if len(rows) > size:
+        rows = rows[:size]
+        next_cursor = encode_values([rows[-1][1], rows[-1][0]])
+    return KeysetPage(
+        [SearchHit(rowid, news_id, snippet)
+         for rowid, _, news_id, snippet in rows],
+        next_cursor
+    )
@@ -0,0 +1,90 @@
+from collections import Counter
+from contextvars import ContextVar
+
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import search
+from .cache import invalidate_home
+from .models import Comment, News, comments_bulk_created
+
+# Новости, удаляемые в текущем контексте: id новости -> список id её
+# комментариев, удалённых каскадом. Индекс и кеш обновляются один раз
+# на новость, а записи индекса удаляются по rowid.
+deleting_news = ContextVar('deleting_news', default={})
+
+
+def touch_news(news_id, comment_delta=0):
+    """
+    Одним UPDATE меняет счётчик комментариев и метку изменения новости.
+
+    По метке modified строятся ETag и Last-Modified страницы новости.
+    """
+    News.objects.filter(pk=news_id).update(
+        comment_count=F('comment_count') + comment_delta,
+        modified=timezone.now(),
+    )
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    touch_news(instance.news_id, 1 if created else 0)
+    search.index_comments([instance])
+    if created:
+        invalidate_home()
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    cascade = deleting_news.get().get(instance.news_id)
+    if cascade is not None:
+        cascade.append(instance.pk)
+        return
+    touch_news(instance.news_id, -1)
+    search.unindex(search.COMMENT, instance.pk)
+    invalidate_home()
+
+
+@receiver(comments_bulk_created, sender=Comment)
+def comments_bulk_created_handler(sender, objs, **kwargs):
+    counts = Counter(obj.news_id for obj in objs)
+    for news_id, count in counts.items():
+        touch_news(news_id, count)
+    invalidate_home()
+    if objs and all(obj.pk for obj in objs):
+        search.index_comments(objs)
+    elif objs:
+        # SQLite в Django 3.2 не возвращает id после bulk_create:
+        # индексируем комментарии этих новостей, созданные не раньше
+        # самого раннего из переданных объектов.
+        search.index_comments(Comment.objects.filter(
+            news_id__in=counts,
+            created__gte=min(obj.created for obj in objs),
+        ))
+
+
+@receiver(post_save, sender=News)
+def news_saved(sender, instance, **kwargs):
+    invalidate_home()
+    search.index_news(instance)
+
+
+@receiver(pre_delete, sender=News)
+def news_deleting(sender, instance, **kwargs):
+    """
+    Отмечает новость, чтобы каскадное удаление комментариев не
+    обновляло новость, индекс и кеш отдельно для каждого комментария.
+    """
+    deleting_news.set({**deleting_news.get(), instance.pk: []})
+
+
+@receiver(post_delete, sender=News)
+def news_deleted(sender, instance, **kwargs):
+    """Django отправляет post_delete новости после её комментариев."""
+    pending = dict(deleting_news.get())
+    comment_ids = pending.pop(instance.pk, ())
+    deleting_news.set(pending)
+    invalidate_home()
+    search.unindex_news(instance.pk, comment_ids)
@@ -1,16 +1,37 @@
+from django.conf import settings
 from django.urls import path
 
-from news import views
+from news import api, async_views, views
 
 app_name = 'news'
 
+if settings.ASYNC_VIEWS:
+    home_view = async_views.news_list
+    detail_view = async_views.news_detail
+else:
+    home_view = views.NewsList.as_view()
+    detail_view = views.NewsDetailView.as_view()
+
 urlpatterns = [
-    path('', views.NewsList.as_view(), name='home'),
-    path('news/<int:pk>/', views.NewsDetailView.as_view(), name='detail'),
+    path('', home_view, name='home'),
+    path('archive/', views.NewsArchive.as_view(), name='archive'),
+    path('search/', views.NewsSearch.as_view(), name='search'),
+    path('news/<int:pk>/', detail_view, name='detail'),
     path(
         'delete_comment/<int:pk>/',
         views.CommentDelete.as_view(),
         name='delete'
     ),
     path('edit_comment/<int:pk>/', views.CommentUpdate.as_view(), name='edit'),
+    path('api/news/', api.NewsListApi.as_view(), name='api_news_list'),
+    path(
+        'api/news/<int:pk>/',
+        api.NewsDetailApi.as_view(),
+        name='api_news_detail'
+    ),
+    path(
+        'api/news/<int:pk>/comments/',
+        api.CommentListApi.as_view(),
+        name='api_comments'
+    ),
 ]
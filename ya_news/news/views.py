@@ -1,11 +1,25 @@
+import hashlib
+import logging
+from http import HTTPStatus
+
 from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.http import Http404, HttpResponse
 from django.shortcuts import get_object_or_404
+from django.template.loader import render_to_string
 from django.urls import reverse
+from django.utils.decorators import method_decorator
 from django.views import generic
+from django.views.decorators.http import condition
 
+from . import search
+from .cache import get_home_fragment
 from .forms import CommentForm
+from .ingest import IngestError, IngestQueueFull, get_ingestor
 from .models import Comment, News
+from .pagination import InvalidCursor, keyset_page
+
+logger = logging.getLogger(__name__)
 
 
 class NewsList(generic.ListView):
@@ -19,24 +33,166 @@ class NewsList(generic.ListView):
 
         Их количество определяется в настройках проекта.
         """
-        return self.model.objects.prefetch_related(
-            'comment_set'
-        )[:settings.NEWS_COUNT_ON_HOME_PAGE]
+        return self.model.objects.all()[:settings.NEWS_COUNT_ON_HOME_PAGE]
+
+    def get_context_data(self, **kwargs):
+        """
+        Список новостей берём из кеша.
+
+        Запрос к базе выполняется только при сборке фрагмента.
+        """
+        context = super().get_context_data(**kwargs)
+        context['news_list_html'] = get_home_fragment(
+            lambda: render_to_string(
+                'includes/news_list.html',
+                {'object_list': self.object_list}
+            )
+        )
+        return context
+
+
+class NewsArchive(generic.ListView):
+    """Архив всех новостей с постраничным выводом по курсору."""
+    model = News
+    template_name = 'news/archive.html'
+    ordering = ('-date', '-id')
+
+    def get_queryset(self):
+        """
+        Новости после курсора ?after= в порядке (date, id) по убыванию.
 
+        Используется индекс (date, id), а не OFFSET, поэтому
+        глубокие страницы архива не дороже первой.
+        """
+        try:
+            return keyset_page(
+                self.model.objects.all(),
+                self.ordering,
+                settings.NEWS_COUNT_ON_ARCHIVE_PAGE,
+                self.request.GET.get('after'),
+            )
+        except InvalidCursor:
+            raise Http404('Некорректный курсор архива.')
 
+
+class NewsSearch(generic.ListView):
+    """Полнотекстовый поиск по новостям и комментариям."""
+    template_name = 'news/search.html'
+
+    def get_queryset(self):
+        """
+        Страница результатов поиска, от более релевантных к менее.
+
+        Новости и комментарии для найденных строк индекса загружаются
+        двумя запросами по первичным ключам.
+        """
+        try:
+            page = search.search(
+                self.request.GET.get('q', ''),
+                settings.SEARCH_RESULTS_ON_PAGE,
+                self.request.GET.get('after'),
+            )
+        except InvalidCursor:
+            raise Http404('Некорректный курсор поиска.')
+        news = News.objects.in_bulk({hit.news_id for hit in page})
+        comments = Comment.objects.select_related('author').in_bulk(
+            [hit.pk for hit in page if hit.is_comment]
+        )
+        for hit in page:
+            hit.news = news.get(hit.news_id)
+            hit.object = comments.get(hit.pk) if hit.is_comment else hit.news
+        page.object_list = [hit for hit in page if hit.object is not None]
+        return page
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['query'] = self.request.GET.get('q', '')
+        return context
+
+
+def news_modified(request, pk):
+    """
+    Метка изменения новости, включая изменения её комментариев.
+
+    Читается одним запросом по первичному ключу и запоминается
+    в запросе, чтобы ETag и Last-Modified не делали его дважды.
+    """
+    if not hasattr(request, '_news_modified'):
+        request._news_modified = News.objects.filter(
+            pk=pk
+        ).values_list('modified', flat=True).first()
+    return request._news_modified
+
+
+def news_etag(request, pk):
+    """
+    Значение ETag: версия новости, пользователь и курсор.
+
+    Форма комментария на странице содержит CSRF-токен, а вход
+    пользователя меняет его. Поэтому для авторизованных в ETag входит
+    и CSRF-cookie: после повторного входа форма со старым токеном
+    не достаётся из кеша браузера.
+    """
+    modified = news_modified(request, pk)
+    if modified is None:
+        return None
+    csrf = ''
+    if request.user.is_authenticated:
+        csrf = request.META.get('CSRF_COOKIE', '')
+    version = (
+        f'{pk}:{modified.isoformat()}:{request.user.pk}:{csrf}:'
+        f'{request.GET.urlencode()}'
+    )
+    return hashlib.md5(version.encode()).hexdigest()
+
+
+def news_last_modified(request, pk):
+    """
+    Last-Modified отдаём только анонимам.
+
+    Авторизованным пользователям страница показывает форму и ссылки
+    на их комментарии, поэтому для них достаточно ETag.
+    """
+    if request.user.is_authenticated or request.GET:
+        return None
+    return news_modified(request, pk)
+
+
+@method_decorator(
+    condition(etag_func=news_etag, last_modified_func=news_last_modified),
+    name='get'
+)
 class NewsDetail(generic.DetailView):
     model = News
     template_name = 'news/detail.html'
+    comments_ordering = ('created', 'id')
 
     def get_object(self, queryset=None):
-        obj = get_object_or_404(
-            self.model.objects.prefetch_related('comment_set__author'),
-            pk=self.kwargs['pk']
-        )
+        obj = get_object_or_404(self.model, pk=self.kwargs['pk'])
         return obj
 
+    def get_comments_page(self):
+        """
+        Страница комментариев после курсора ?after=.
+
+        Выборка идёт по индексу (news, created, id), поэтому
+        тысячная страница стоит столько же, сколько первая.
+        """
+        try:
+            return keyset_page(
+                Comment.objects.filter(
+                    news_id=self.kwargs['pk']
+                ).select_related('author'),
+                self.comments_ordering,
+                settings.COMMENTS_COUNT_ON_PAGE,
+                self.request.GET.get('after'),
+            )
+        except InvalidCursor:
+            raise Http404('Некорректный курсор комментариев.')
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        context['comments'] = self.get_comments_page()
         if self.request.user.is_authenticated:
             context['form'] = CommentForm()
         return context
@@ -59,12 +215,45 @@ class NewsComment(
         comment = form.save(commit=False)
         comment.news = self.object
         comment.author = self.request.user
+        if settings.COMMENT_INGEST['ENABLED']:
+            return self.ingest(comment, form)
         comment.save()
         return super().form_valid(form)
 
+    def ingest(self, comment, form):
+        """
+        Отдаёт комментарий фоновому писателю вместо INSERT в запросе.
+
+        В режиме DURABLE ждём записи пакета перед редиректом, чтобы
+        пользователь увидел свой комментарий на странице новости.
+        """
+        options = settings.COMMENT_INGEST
+        try:
+            pending = get_ingestor().submit(comment)
+        except IngestQueueFull:
+            response = HttpResponse(
+                'Слишком много комментариев, попробуйте позже.',
+                status=HTTPStatus.SERVICE_UNAVAILABLE,
+            )
+            response['Retry-After'] = options['RETRY_AFTER']
+            return response
+        try:
+            flushed = not options['DURABLE'] or pending.wait(
+                options['WAIT_TIMEOUT_MS'] / 1000
+            )
+        except IngestError:
+            form.add_error(None, 'Не удалось сохранить комментарий.')
+            return self.form_invalid(form)
+        if not flushed:
+            logger.warning(
+                'Comment to news %s is not flushed yet', self.object.pk
+            )
+        return super().form_valid(form)
+
     def get_success_url(self):
-        post = self.get_object()
-        return reverse('news:detail', kwargs={'pk': post.pk}) + '#comments'
+        return reverse(
+            'news:detail', kwargs={'pk': self.object.pk}
+        ) + '#comments'
 
 
 class NewsDetailView(generic.View):
@@ -83,14 +272,16 @@ class CommentBase(LoginRequiredMixin):
     model = Comment
 
     def get_success_url(self):
-        comment = self.get_object()
+        """Объект уже загружен в post(), новость берём по news_id."""
         return reverse(
-            'news:detail', kwargs={'pk': comment.news.pk}
+            'news:detail', kwargs={'pk': self.object.news_id}
         ) + '#comments'
 
     def get_queryset(self):
         """Пользователь может работать только со своими комментариями."""
-        return self.model.objects.filter(author=self.request.user)
+        return self.model.objects.filter(
+            author=self.request.user
+        ).select_related('news')
 
 
 class CommentUpdate(CommentBase, generic.UpdateView):
@@ -2,6 +2,8 @@
 ASGI config for yanews project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Read views are served by their async variants, set DJANGO_ASYNC_VIEWS=0
+to use the sync ones.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
@@ -9,8 +11,15 @@ https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
 
 import os
 
+from django.conf import settings
 from django.core.asgi import get_asgi_application
 
+from news import template_cache
+
+os.environ.setdefault('DJANGO_ASYNC_VIEWS', '1')
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yanews.settings')
 
 application = get_asgi_application()
+
+if settings.TEMPLATE_WARMUP:
+    template_cache.warm_up()
@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 from django.urls import reverse_lazy
@@ -21,6 +22,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'news.middleware.QueryCountMiddleware',
+    'news.middleware.ReplicaMiddleware',
+    'news.middleware.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -48,6 +52,25 @@ TEMPLATES = [
     },
 ]
 
+# Сжатие ответов gzip, см. middleware.CompressionMiddleware.
+COMPRESSION_LEVEL = 6
+# Более короткие тела не сжимаются: выигрыш меньше накладных расходов.
+COMPRESSION_MIN_SIZE = 1024
+# Сжимаются только ответы с Content-Type, начинающимся с этих строк.
+COMPRESSION_TYPES = (
+    'text/', 'application/json', 'application/javascript',
+    'application/xml', 'image/svg+xml',
+)
+# Потоковый ответ сбрасывается клиенту после стольких байт тела.
+COMPRESSION_STREAM_FLUSH_SIZE = 16 * 1024
+COMPRESSION_CACHE_TIMEOUT = 60 * 15
+# Счётчики сжатия копятся в процессе и переносятся в общий кеш
+# не чаще раза в столько секунд.
+COMPRESSION_STATS_FLUSH_INTERVAL = 10
+
+# Компилировать все шаблоны при запуске, см. settings_prod.py.
+TEMPLATE_WARMUP = False
+
 WSGI_APPLICATION = 'yanews.wsgi.application'
 
 
@@ -55,9 +78,70 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Соединение переиспользуется между запросами, исправность
+        # проверяется перед каждым запросом (см. db.check_connections).
+        'CONN_MAX_AGE': int(os.environ.get('DJANGO_CONN_MAX_AGE', 60)),
     }
 }
 
+# Реплики только для чтения: пути к копиям базы через запятую,
+# например DJANGO_DB_REPLICAS=replica.sqlite3. Псевдонимы replica1...
+REPLICA_DATABASES = []
+for number, name in enumerate(
+        filter(None, os.environ.get('DJANGO_DB_REPLICAS', '').split(',')), 1
+):
+    REPLICA_DATABASES.append(f'replica{number}')
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'], 'NAME': name, 'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['news.router.ReplicaRouter']
+# Маршруты, которые читают с реплик (только GET и HEAD).
+REPLICA_READ_VIEWS = ('news:home', 'news:detail')
+# round_robin - по кругу, lag - с наименьшим отставанием.
+REPLICA_SELECTION = os.environ.get('DJANGO_DB_REPLICA_SELECTION', 'round_robin')
+# Реплики, отставшие сильнее, не используются, секунды.
+REPLICA_MAX_LAG = 30
+REPLICA_LAG_CHECK_INTERVAL = 5
+# Сколько секунд после записи пользователь читает с основной базы;
+# не меньше отставания, которое допускает маршрутизатор, иначе
+# пользователь может не увидеть свою запись.
+REPLICA_PIN_SECONDS = REPLICA_MAX_LAG + REPLICA_LAG_CHECK_INTERVAL
+
+# Применяются к каждому новому соединению с SQLite.
+SQLITE_PRAGMAS = {
+    # Читатели не блокируют писателя и наоборот.
+    'journal_mode': 'wal',
+    # В режиме WAL не теряет целостность, fsync только на checkpoint.
+    'synchronous': 'normal',
+    # Ждать освобождения блокировки вместо ошибки database is locked, мс.
+    'busy_timeout': 5000,
+    # Кеш страниц в КиБ (отрицательное значение) и отображение файла.
+    'cache_size': -20000,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'memory',
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Сессии и пользователи запросов отдельно от кеша страниц:
+    # их не вытесняют страницы и не сбрасывает cache.clear().
+    'sessions': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'sessions',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+
+# Сессия читается из кеша, а записывается и в кеш, и в базу.
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+SESSION_CACHE_ALIAS = 'sessions'
+# request.user берётся из кеша SESSION_CACHE_ALIAS, см. news.auth.
+AUTHENTICATION_BACKENDS = ['news.auth.CachedModelBackend']
+USER_CACHE_TIMEOUT = 60 * 15
+
 
 AUTH_PASSWORD_VALIDATORS = []
 
@@ -80,3 +164,65 @@ LOGIN_URL = reverse_lazy('users:login')
 LOGIN_REDIRECT_URL = reverse_lazy('news:home')
 
 NEWS_COUNT_ON_HOME_PAGE = 10
+
+NEWS_COUNT_ON_ARCHIVE_PAGE = 20
+
+COMMENTS_COUNT_ON_PAGE = 50
+
+SEARCH_RESULTS_ON_PAGE = 20
+
+API_MAX_PAGE_SIZE = 500
+API_CHUNK_SIZE = 200
+
+HOME_CACHE_TIMEOUT = 60 * 60
+HOME_CACHE_LOCK_TIMEOUT = 10
+
+# Файл с дополнительными запрещёнными словами, по одному на строку.
+BAD_WORDS_FILE = None
+BAD_WORDS_RELOAD_INTERVAL = 5
+
+# Пакетная запись комментариев фоновым потоком на пиках нагрузки.
+COMMENT_INGEST = {
+    'ENABLED': False,
+    'BATCH_SIZE': 100,
+    'FLUSH_INTERVAL_MS': 50,
+    'QUEUE_SIZE': 10000,
+    'PUT_TIMEOUT_MS': 100,
+    'DURABLE': True,
+    'WAIT_TIMEOUT_MS': 5000,
+    'RETRY_AFTER': 5,
+}
+
+# Асинхронные представления для чтения; включаются в asgi.py.
+ASYNC_VIEWS = os.environ.get('DJANGO_ASYNC_VIEWS') == '1'
+# Потоков для запросов к базе из async-представлений,
+# 0 - выполнять их в общем потоке Django.
+ASYNC_DB_POOL_SIZE = int(os.environ.get('DJANGO_ASYNC_DB_POOL_SIZE', 8))
+
+# Максимальное число запросов к базе на один запрос к маршруту.
+QUERY_BUDGETS = {
+    'news:home': 1,
+    'news:archive': 1,
+    'news:search': 3,
+    'news:detail': 5,
+    'news:edit': 5,
+    'news:delete': 4,
+    'news:api_news_list': 1,
+    'news:api_news_detail': 1,
+    'news:api_comments': 2,
+    'users:login': 2,
+    'users:logout': 2,
+    'users:signup': 2,
+}
+QUERY_BUDGET_ENFORCE = False
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'news.middleware': {'handlers': ['console'], 'level': 'INFO'},
+    },
+}
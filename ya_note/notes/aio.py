@@ -0,0 +1,84 @@
+import threading
+from calendar import timegm
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """
+    Пул потоков для запросов к базе из async-представлений.
+
+    Размер пула ограничен ASYNC_DB_POOL_SIZE: каждый поток держит своё
+    соединение, поэтому это заодно и ограничение числа соединений.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.ASYNC_DB_POOL_SIZE,
+                thread_name_prefix='db',
+            )
+    return _executor
+
+
+def _call_in_pool(func, *args, **kwargs):
+    """
+    Выполняет func в потоке пула так же, как обработчик WSGI-запроса.
+
+    Устаревшие соединения закрываются до и после вызова; запросы
+    учитываются счётчиком текущего запроса через контекст.
+    """
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+async def run_db(func, *args, **kwargs):
+    """
+    Вызывает синхронную функцию, работающую с базой, из async-кода.
+
+    При ASYNC_DB_POOL_SIZE = 0 вызов идёт в общий поток Django
+    (thread_sensitive), как у адаптированных синхронных представлений.
+    """
+    if not settings.ASYNC_DB_POOL_SIZE:
+        return await sync_to_async(func)(*args, **kwargs)
+    return await sync_to_async(
+        _call_in_pool, thread_sensitive=False, executor=get_executor()
+    )(func, *args, **kwargs)
+
+
+def load_user(request):
+    """Загружает ленивый request.user, чтобы шаблон не ходил в базу."""
+    return request.user.is_authenticated
+
+
+async def condition_response(request, etag, last_modified, respond):
+    """
+    То же, что декоратор condition(), для async-представления.
+
+    Значения валидаторов вычисляются заранее, respond() - корутина,
+    которая строит ответ, если клиентская копия устарела.
+    """
+    etag = quote_etag(etag) if etag else None
+    timestamp = timegm(last_modified.utctimetuple()) if last_modified else None
+    response = get_conditional_response(
+        request, etag=etag, last_modified=timestamp
+    )
+    if response is None:
+        response = await respond()
+    if request.method in ('GET', 'HEAD'):
+        if timestamp and not response.has_header('Last-Modified'):
+            response['Last-Modified'] = http_date(timestamp)
+        if etag:
+            response.headers.setdefault('ETag', etag)
+    return response
@@ -0,0 +1,53 @@
+from django.http import HttpResponseNotAllowed
+from django.shortcuts import render
+
+from .aio import condition_response, load_user, run_db
+from .views import NoteDetail, NotesList, note_etag, note_modified
+
+# Асинхронные варианты представлений для чтения, подключаются
+# в urls.py при ASYNC_VIEWS. Работа с базой идёт через run_db().
+
+
+async def notes_list(request):
+    """Список заметок пользователя, как NotesList."""
+    view = NotesList()
+    view.setup(request)
+    if not await run_db(load_user, request):
+        return view.handle_no_permission()
+    notes = await run_db(view.get_queryset)
+    return render(request, view.template_name, {
+        'object_list': notes,
+        'note_list': notes,
+        'next_cursor': view.next_cursor,
+        'view': view,
+    })
+
+
+def note_validators(request, slug):
+    return note_etag(request, slug), note_modified(request, slug)
+
+
+async def note_detail(request, slug):
+    """
+    Заметка подробно, как NoteDetail.
+
+    Заметка загружается вместе с валидаторами и запоминается
+    в запросе, поэтому ответ строится без повторного запроса.
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return HttpResponseNotAllowed(('GET', 'HEAD'))
+    view = NoteDetail()
+    view.setup(request, slug=slug)
+    if not await run_db(load_user, request):
+        return view.handle_no_permission()
+    etag, last_modified = await run_db(note_validators, request, slug)
+
+    async def respond():
+        note = view.get_object()
+        return render(request, view.template_name, {
+            'object': note,
+            'note': note,
+            'view': view,
+        })
+
+    return await condition_response(request, etag, last_modified, respond)
@@ -0,0 +1,57 @@
+from django.conf import settings
+from django.contrib.auth import user_logged_in
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import caches
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+USER_KEY = 'auth:user:{pk}'
+
+
+def user_cache():
+    """Пользователи хранятся в том же кеше, что и сессии."""
+    return caches[settings.SESSION_CACHE_ALIAS]
+
+
+def cache_user(user):
+    user_cache().set(
+        USER_KEY.format(pk=user.pk), user, settings.USER_CACHE_TIMEOUT
+    )
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    ModelBackend, берущий пользователя запроса из кеша.
+
+    В сессии хранится только id пользователя, поэтому без кеша каждый
+    запрос авторизованного пользователя читал бы auth_user.
+    Кеш сбрасывается при сохранении и удалении пользователя, в том
+    числе при смене пароля; изменения через QuerySet.update() его
+    не сбрасывают.
+    """
+
+    def get_user(self, user_id):
+        user = user_cache().get(USER_KEY.format(pk=user_id))
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                cache_user(user)
+            return user
+        return user if self.user_can_authenticate(user) else None
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def invalidate_user(sender, instance, **kwargs):
+    user_cache().delete(USER_KEY.format(pk=instance.pk))
+
+
+@receiver(user_logged_in)
+def user_logged_in_cache(sender, request, user, **kwargs):
+    """
+    Кладёт пользователя в кеш при входе.
+
+    Обработчик подключается после update_last_login, поэтому в кеш
+    попадает пользователь уже с новым last_login.
+    """
+    cache_user(user)
@@ -0,0 +1,182 @@
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from . import cache, revisions, search, signals
+from .forms import WARNING, NoteForm
+from .models import Note
+from .slugs import allocate_slugs, slug_bases
+
+CREATE, UPDATE, DELETE = 'create', 'update', 'delete'
+OPERATIONS = (CREATE, UPDATE, DELETE)
+TEXT_FIELDS = ('title', 'text', 'slug')
+# id больше 64-битного INTEGER SQLite не принимает.
+MAX_ID = 2 ** 63 - 1
+# Занят slug, который выбран другой операцией этого же пакета.
+IN_BATCH = object()
+
+
+class BatchError(ValueError):
+    """Тело запроса не является пакетом операций."""
+
+
+class BatchNoteForm(NoteForm):
+    """
+    NoteForm с проверкой slug по заранее выбранным занятым slug.
+
+    taken_slugs - словарь slug -> id заметки, общий для всего пакета:
+    занятость всех заданных slug проверяется одним запросом.
+    """
+
+    def __init__(self, *args, taken_slugs, **kwargs):
+        self.taken_slugs = taken_slugs
+        super().__init__(*args, **kwargs)
+
+    def clean_slug(self):
+        slug = self.cleaned_data.get('slug')
+        if slug and self.taken_slugs.get(
+                slug, self.instance.pk
+        ) != self.instance.pk:
+            raise ValidationError(slug + WARNING)
+        return slug
+
+
+def parse_operations(body):
+    """Операции из JSON вида {"operations": [{"op": ..., ...}, ...]}."""
+    try:
+        operations = json.loads(body)['operations']
+    except (ValueError, KeyError, TypeError):
+        raise BatchError('Ожидается JSON с ключом operations.')
+    if not isinstance(operations, list):
+        raise BatchError('operations должен быть списком.')
+    if len(operations) > settings.NOTES_BATCH_MAX_OPERATIONS:
+        raise BatchError(
+            'Не больше '
+            f'{settings.NOTES_BATCH_MAX_OPERATIONS} операций в пакете.'
+        )
+    for operation in operations:
+        if not isinstance(operation, dict) or (
+                operation.get('op') not in OPERATIONS
+        ):
+            raise BatchError(
+                'Операция должна быть объектом с op: '
+                + ', '.join(OPERATIONS) + '.'
+            )
+        if operation['op'] != CREATE and not is_id(operation.get('id')):
+            raise BatchError('Для update и delete нужен id заметки.')
+        for field in TEXT_FIELDS:
+            if not isinstance(operation.get(field, ''), str):
+                raise BatchError(f'{field} должен быть строкой.')
+    return operations
+
+
+def is_id(value):
+    # bool - подкласс int, но id заметки быть не может.
+    return (
+        isinstance(value, int) and not isinstance(value, bool)
+        and 0 < value <= MAX_ID
+    )
+
+
+def error(message, field='id'):
+    return {'status': 'error', 'errors': {field: [message]}}
+
+
+def apply_batch(author, operations):
+    """
+    Проверяет и применяет пакет операций над заметками автора.
+
+    Пакет применяется целиком в одной транзакции или не применяется
+    вовсе, если хотя бы одна операция не прошла проверку.
+    Возвращает признак применения и результат для каждой операции.
+    """
+    ids = [op['id'] for op in operations if op['op'] != CREATE]
+    notes = Note.objects.filter(author=author).in_bulk(ids)
+    taken = dict(Note.objects.filter(slug__in={
+        op['slug'] for op in operations
+        if op['op'] != DELETE and op.get('slug')
+    }).values_list('slug', 'pk'))
+    results, seen, valid = [], set(), []
+    for op in operations:
+        pk = None if op['op'] == CREATE else op['id']
+        if pk is not None:
+            if pk not in notes:
+                results.append(error('Заметка не найдена.'))
+                continue
+            if pk in seen:
+                results.append(
+                    error('Заметка уже изменяется в этом пакете.')
+                )
+                continue
+            seen.add(pk)
+        if op['op'] == DELETE:
+            results.append({'status': 'ok'})
+            valid.append((op['op'], notes[pk]))
+            continue
+        form = BatchNoteForm(
+            data=op,
+            instance=notes[pk] if pk else Note(author=author),
+            taken_slugs=taken,
+        )
+        if not form.is_valid():
+            results.append({'status': 'error', 'errors': {
+                field: list(messages)
+                for field, messages in form.errors.items()
+            }})
+            continue
+        if form.instance.slug:
+            taken[form.instance.slug] = IN_BATCH
+        results.append({'status': 'ok'})
+        valid.append((op['op'], form.instance))
+    if any(result['status'] != 'ok' for result in results):
+        return False, results
+    write(author, valid, set(taken))
+    for result, (op, note) in zip(results, valid):
+        result.update(op=op, id=note.pk, slug=note.slug)
+    return True, results
+
+
+def write(author, operations, reserved):
+    """
+    Записывает проверенные операции пачками в одной транзакции.
+
+    Пустые slug подбираются для всего пакета одним вызовом
+    allocate_slugs(); версии, поисковый индекс и кеш обновляются
+    один раз на пачку, а не обработчиками сигналов по каждой заметке.
+    """
+    created = [note for op, note in operations if op == CREATE]
+    updated = [note for op, note in operations if op == UPDATE]
+    deleted = [note.pk for op, note in operations if op == DELETE]
+    max_length = Note._meta.get_field('slug').max_length
+    blank = [note for note in created + updated if not note.slug]
+    # Как и в Note.save(), текущий slug заметки не мешает ей самой.
+    others = Note.objects.exclude(pk__in=[note.pk for note in blank])
+    bases = slug_bases([note.title for note in blank], max_length)
+    for note, slug in zip(blank, allocate_slugs(
+            others, bases, max_length, reserved=reserved
+    )):
+        note.slug = slug
+    now = timezone.now()
+    for note in updated:
+        note.modified = now
+    with transaction.atomic(), signals.muted():
+        Note.objects.bulk_create(created)
+        # SQLite не возвращает id после bulk_create,
+        # находим новые заметки по уникальным slug.
+        ids = dict(Note.objects.filter(
+            slug__in=[note.slug for note in created]
+        ).values_list('slug', 'pk'))
+        for note in created:
+            note.pk = ids[note.slug]
+        Note.objects.bulk_update(
+            updated, ('title', 'text', 'slug', 'modified')
+        )
+        Note.objects.filter(pk__in=deleted).delete()
+        revisions.record_initial_revisions(created)
+        revisions.record_revisions(updated)
+        search.index_notes(created + updated)
+        search.unindex_notes(deleted)
+    cache.invalidate_author(author.pk)
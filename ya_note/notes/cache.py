@@ -0,0 +1,52 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from .router import read_from_primary
+
+VERSION_KEY = 'notes:version:{author_id}'
+LIST_KEY = 'notes:list:{author_id}:{version}:{after}'
+DETAIL_KEY = 'notes:detail:{author_id}:{version}:{slug}'
+
+
+def get_version(author_id):
+    key = VERSION_KEY.format(author_id=author_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, 1, None)
+        version = cache.get(key, 1)
+    return version
+
+
+def invalidate_author(author_id):
+    """
+    Сбрасывает кеш заметок автора, увеличивая версию его ключей.
+
+    Старые записи не удаляются и не ищутся: они перестают читаться
+    и вытесняются кешем по таймауту.
+    """
+    key = VERSION_KEY.format(author_id=author_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 2, None):
+            cache.incr(key)
+
+
+def get_or_build(key_template, author_id, build, **params):
+    """
+    Значение из кеша автора; при промахе собирается через build().
+
+    None не кешируется, чтобы отсутствующая заметка не закрывала
+    собой заметку, созданную позже. Значение собирается по основной
+    базе: устаревшее чтение с реплики пережило бы сброс кеша.
+    """
+    key = key_template.format(
+        author_id=author_id, version=get_version(author_id), **params
+    )
+    value = cache.get(key)
+    if value is None:
+        with read_from_primary():
+            value = build()
+        if value is not None:
+            cache.set(key, value, settings.NOTES_CACHE_TIMEOUT)
+    return value
@@ -0,0 +1,121 @@
+import re
+import sqlite3
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import Error, connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+PRAGMA_NAME = re.compile(r'^[a-z_]+$')
+
+# Диапазон 64-битного INTEGER: SQLite не принимает большие числа.
+SQL_INTEGER_MIN, SQL_INTEGER_MAX = -2 ** 63, 2 ** 63 - 1
+
+# Счётчик запросов к базе текущего HTTP-запроса. Контекст переходит
+# в потоки sync_to_async и в чтение потокового ответа, поэтому
+# запросы считаются, в каком бы потоке их ни выполнили.
+current_counter = ContextVar('current_counter', default=None)
+
+
+class QueryCounter:
+    """
+    Число запросов к базе и их суммарное время.
+
+    Может пополняться из нескольких потоков сразу.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.lock = threading.Lock()
+
+    def add(self, duration):
+        with self.lock:
+            self.count += 1
+            self.duration += duration
+
+
+def count_query(execute, sql, params, many, context):
+    """Обёртка execute_wrapper, учитывающая запрос в current_counter."""
+    counter = current_counter.get()
+    if counter is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        counter.add(time.perf_counter() - started)
+
+
+def apply_pragmas(raw_connection, pragmas):
+    """Выполняет PRAGMA из словаря имя -> значение на соединении sqlite3."""
+    for name, value in pragmas.items():
+        if not PRAGMA_NAME.match(name):
+            raise ValueError(f'Некорректное имя PRAGMA: {name!r}.')
+        raw_connection.execute(f'PRAGMA {name} = {value}')
+
+
+@receiver(connection_created)
+def tune_sqlite(sender, connection, **kwargs):
+    """
+    Настраивает каждое новое соединение с SQLite по SQLITE_PRAGMAS.
+
+    journal_mode=wal хранится в самом файле базы, остальные
+    PRAGMA действуют только на соединение, поэтому задаются каждый раз.
+    """
+    if connection.vendor == 'sqlite':
+        apply_pragmas(connection.connection, settings.SQLITE_PRAGMAS)
+
+
+@receiver(connection_created)
+def install_query_counter(sender, connection, **kwargs):
+    """
+    Подключает count_query к соединению навсегда.
+
+    Обёртка ставится в начало списка: execute_wrapper() снимает
+    последнюю обёртку, а соединение может открыться внутри него.
+    """
+    if count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, count_query)
+
+
+def is_healthy(connection):
+    """
+    Соединение ещё можно использовать.
+
+    Для SQLite is_usable() всегда истинно, поэтому выполняется
+    SELECT 1 напрямую, в обход курсоров Django и счётчика запросов.
+    """
+    if connection.vendor != 'sqlite':
+        return connection.is_usable()
+    try:
+        connection.connection.execute('SELECT 1')
+    except sqlite3.Error:
+        return False
+    return True
+
+
+@receiver(request_started)
+def check_connections(sender, **kwargs):
+    """
+    Закрывает неисправные постоянные соединения перед запросом.
+
+    Django 3.2 проверяет при CONN_MAX_AGE только возраст соединения
+    и ошибки прошлого запроса; сломанное соединение иначе дожило бы
+    до первого запроса к базе и уронило бы его.
+    """
+    for connection in connections.all():
+        if (
+            connection.connection is not None
+            and connection.settings_dict['CONN_MAX_AGE']
+            and not connection.in_atomic_block
+            and not is_healthy(connection)
+        ):
+            try:
+                connection.close()
+            except Error:
+                connection.connection = None
@@ -0,0 +1,116 @@
+import zlib
+
+from django.db import models
+from django.db.backends.signals import connection_created
+from django.db.models.query_utils import DeferredAttribute
+from django.dispatch import receiver
+
+# Тексты короче этого размера в байтах хранятся как есть.
+DEFAULT_THRESHOLD = 4096
+# Функция SQLite для чтения поля в SQL-запросах, например при
+# перестроении поискового индекса.
+SQL_FUNCTION = 'decompress_text'
+
+
+class CompressedText(bytes):
+    """Сжатое значение поля, прочитанное из базы и ещё не распакованное."""
+
+    def __str__(self):
+        return decompress(self)
+
+
+def decompress(value):
+    return zlib.decompress(value).decode()
+
+
+def to_text(value):
+    """Текст из строки values(): сжатые байты распаковываются."""
+    if isinstance(value, bytes):
+        return decompress(value)
+    return value
+
+
+@receiver(connection_created)
+def register_sql_function(sender, connection, **kwargs):
+    if connection.vendor == 'sqlite':
+        connection.connection.create_function(
+            SQL_FUNCTION, 1, to_text, deterministic=True
+        )
+
+
+class CompressedTextDescriptor(DeferredAttribute):
+    """
+    Распаковывает значение при первом обращении к атрибуту.
+
+    В отличие от DeferredAttribute это data-дескриптор: иначе значение
+    из __dict__ экземпляра возвращалось бы в обход __get__().
+    """
+
+    def __set__(self, instance, value):
+        instance.__dict__[self.field.attname] = value
+
+    def __get__(self, instance, cls=None):
+        value = super().__get__(instance, cls)
+        if isinstance(value, CompressedText):
+            value = decompress(value)
+            instance.__dict__[self.field.attname] = value
+        return value
+
+
+class CompressedTextField(models.TextField):
+    """
+    Текстовое поле, которое сжимает длинные значения zlib.
+
+    Значение от threshold байт и больше пишется в колонку как BLOB,
+    если сжатие его уменьшает; короткие тексты остаются строками.
+    Строки модели, у которых текст не читали, не распаковываются
+    ни при загрузке, ни при повторном сохранении.
+    """
+    descriptor_class = CompressedTextDescriptor
+
+    def __init__(self, *args, threshold=DEFAULT_THRESHOLD, level=6,
+                 **kwargs):
+        self.threshold = threshold
+        self.level = level
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if self.threshold != DEFAULT_THRESHOLD:
+            kwargs['threshold'] = self.threshold
+        if self.level != 6:
+            kwargs['level'] = self.level
+        return name, path, args, kwargs
+
+    def from_db_value(self, value, expression, connection):
+        if isinstance(value, bytes):
+            return CompressedText(value)
+        return value
+
+    def to_python(self, value):
+        if isinstance(value, bytes):
+            return decompress(value)
+        return super().to_python(value)
+
+    def pre_save(self, model_instance, add):
+        if self.attname in model_instance.__dict__:
+            return model_instance.__dict__[self.attname]
+        return super().pre_save(model_instance, add)
+
+    def get_prep_value(self, value):
+        if isinstance(value, CompressedText):
+            return value
+        return super().get_prep_value(value)
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        if not prepared:
+            value = self.get_prep_value(value)
+        if isinstance(value, CompressedText):
+            return bytes(value)
+        if isinstance(value, str):
+            data = value.encode()
+            if len(data) >= self.threshold:
+                compressed = zlib.compress(data, self.level)
+                if len(compressed) < len(data):
+                    return compressed
+        return value
@@ -1,9 +1,8 @@
-from pytils.translit import slugify
-
 from django import forms
 from django.core.exceptions import ValidationError
 
 from .models import Note
+from .slugs import is_slug_taken
 
 WARNING = ' - такой slug уже существует, придумайте уникальное значение!'
 
@@ -16,14 +15,27 @@ class NoteForm(forms.ModelForm):
         fields = ('title', 'text', 'slug')
 
     def clean_slug(self):
-        """Обрабатывает случай, если slug не уникален."""
-        cleaned_data = super().clean()
-        slug = cleaned_data.get('slug')
-        if not slug:
-            title = cleaned_data.get('title')
-            slug = slugify(title)[:100]
-        if Note.objects.filter(
-                slug=slug
-        ).exclude(id=self.instance.pk).exists():
+        """
+        Обрабатывает случай, если slug не уникален.
+
+        Пустой slug оставляем пустым: уникальный slug по заголовку
+        подберёт Note.save() в момент записи.
+        """
+        slug = self.cleaned_data.get('slug')
+        if slug and is_slug_taken(
+                Note.objects.all(), slug, exclude_pk=self.instance.pk
+        ):
             raise ValidationError(slug + WARNING)
         return slug
+
+    def validate_unique(self):
+        """
+        Не проверяем slug повторно.
+
+        Заданный slug проверен в clean_slug, пустой подберёт Note.save().
+        """
+        exclude = set(self._get_validation_exclusions()) | {'slug'}
+        try:
+            self.instance.validate_unique(exclude=exclude)
+        except ValidationError as error:
+            self._update_errors(error)
@@ -0,0 +1,60 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from pytils.translit import slugify as pytils_slugify
+
+from notes.translit import slugify, slugify_many
+
+ALPHABET = 'абвгдеёжзийклмнопрстуфхцчшщъыьэюя'
+WORDS = ('Django', 'SQLite', '2024', '&', '—', '«заметка»', 'v2.0')
+
+
+def random_title(rng):
+    words = [
+        ''.join(rng.choice(ALPHABET) for _ in range(rng.randint(3, 9)))
+        for _ in range(rng.randint(2, 6))
+    ]
+    words.insert(rng.randrange(len(words)), rng.choice(WORDS))
+    return ' '.join(words).capitalize()
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает pytils.translit.slugify с табличной '
+        'транслитерацией notes.translit по одному и пачками.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=1_000_000)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        titles = [random_title(rng) for _ in range(options['count'])]
+        batch_size = options['batch_size']
+
+        started = time.perf_counter()
+        expected = [pytils_slugify(title) for title in titles]
+        pytils_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        single = [slugify(title) for title in titles]
+        single_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        batched = []
+        for start in range(0, len(titles), batch_size):
+            batched.extend(slugify_many(titles[start:start + batch_size]))
+        batch_time = time.perf_counter() - started
+
+        self.stdout.write(
+            f'Заголовков: {len(titles)}\n'
+            f'pytils: {pytils_time:.3f} с\n'
+            f'По одному: {single_time:.3f} с, '
+            f'ускорение {pytils_time / single_time:.1f}x\n'
+            f'Пачками по {batch_size}: {batch_time:.3f} с, '
+            f'ускорение {pytils_time / batch_time:.1f}x\n'
+            f'Совпадает с pytils: {single == expected == batched}'
+        )
@@ -0,0 +1,72 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.template import Context, Engine, engines
+from django.test import RequestFactory
+
+from notes.models import Note
+from notes.template_cache import warm_up
+
+TEMPLATES = ('notes/list.html',)
+LOADERS = (
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+)
+
+
+def build_engine(cached):
+    """Движок с настройками проекта и загрузчиком cached или без него."""
+    engine = engines['django'].engine
+    return Engine(
+        dirs=engine.dirs,
+        loaders=[('django.template.loaders.cached.Loader', LOADERS)]
+        if cached else LOADERS,
+        libraries=engine.libraries,
+        debug=False,
+    )
+
+
+def build_context(notes):
+    """Контекст списка заметок как у NotesList, без обращений к базе."""
+    user = get_user_model()(pk=1, username='Автор')
+    request = RequestFactory().get('/')
+    request.user = user
+    return {
+        'request': request,
+        'user': user,
+        'object_list': [
+            Note(pk=index, title=f'Заметка {index}', slug=f'note-{index}')
+            for index in range(1, notes + 1)
+        ],
+        'next_cursor': notes,
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает время загрузки и отрисовки шаблонов '
+        + ', '.join(TEMPLATES)
+        + ' с загрузчиком cached и без него.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--renders', type=int, default=2000)
+        parser.add_argument('--notes', type=int, default=10)
+
+    def handle(self, *args, **options):
+        context = build_context(options['notes'])
+        for name in TEMPLATES:
+            for cached in (False, True):
+                engine = build_engine(cached)
+                if cached:
+                    warm_up(engine)
+                started = time.perf_counter()
+                for _ in range(options['renders']):
+                    engine.get_template(name).render(Context(context))
+                elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f'{name} {"cached" if cached else "без кеша"}: '
+                    f'{elapsed / options["renders"] * 1e6:.0f} мкс '
+                    f'на отрисовку'
+                )
@@ -0,0 +1,59 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+
+from notes.fields import to_text
+from notes.models import Note
+
+EXPORT_FIELDS = {
+    'title': 'title',
+    'text': 'text',
+    'slug': 'slug',
+    'author': 'author__username',
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает заметки в JSONL в формате import_notes. '
+        'Строки читаются из базы порциями через iterator().'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output', default='-', help='Файл или - для stdout.'
+        )
+        parser.add_argument('--author', help='Выгрузить заметки автора.')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        notes = Note.objects.order_by('pk')
+        if options['author']:
+            notes = notes.filter(author__username=options['author'])
+        rows = notes.values(*EXPORT_FIELDS.values()).iterator(
+            chunk_size=options['chunk_size']
+        )
+        output = (
+            self.stdout if options['output'] == '-'
+            else open(options['output'], 'w', encoding='utf-8')
+        )
+        started = time.perf_counter()
+        exported = 0
+        try:
+            for row in rows:
+                note = {
+                    name: row[field] for name, field in EXPORT_FIELDS.items()
+                }
+                output.write(json.dumps(
+                    note, ensure_ascii=False, default=to_text
+                ) + '\n')
+                exported += 1
+        finally:
+            if output is not self.stdout:
+                output.close()
+        elapsed = time.perf_counter() - started
+        self.stderr.write(
+            f'Выгружено {exported} заметок, '
+            f'{exported / elapsed if elapsed else 0:.0f} в секунду'
+        )
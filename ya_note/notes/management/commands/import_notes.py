@@ -0,0 +1,122 @@
+import json
+import sys
+import time
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+
+from notes import cache, revisions, search
+from notes.models import SLUG_ATTEMPTS, Note
+from notes.slugs import allocate_slugs, slug_bases
+
+
+class Command(BaseCommand):
+    help = (
+        'Импортирует заметки из JSONL: по объекту {"title", "text", '
+        '"slug", "author"} на строку. Заметки пишутся пачками через '
+        'bulk_create, slug для всей пачки подбираются заранее; '
+        'занятый slug получает числовой суффикс.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл JSONL или - для stdin.')
+        parser.add_argument(
+            '--author',
+            help='Имя автора для строк без поля author.'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        self.authors = {}
+        self.default_author = options['author']
+        max_length = Note._meta.get_field('slug').max_length
+        started = time.perf_counter()
+        imported = 0
+        source = (
+            sys.stdin if options['path'] == '-'
+            else open(options['path'], encoding='utf-8')
+        )
+        with source:
+            lines = enumerate(source, start=1)
+            while True:
+                batch = [
+                    (number, line) for number, line in
+                    islice(lines, options['batch_size']) if line.strip()
+                ]
+                if not batch:
+                    break
+                imported += self.import_batch(batch, max_length)
+                elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f'Импортировано {imported} заметок, '
+                    f'{imported / elapsed:.0f} в секунду'
+                )
+
+    def parse(self, number, line):
+        try:
+            item = json.loads(line)
+        except ValueError as error:
+            raise CommandError(f'Строка {number}: {error}')
+        if not isinstance(item, dict) or 'text' not in item:
+            raise CommandError(f'Строка {number}: нет поля text')
+        item.setdefault('author', self.default_author)
+        if not item['author']:
+            raise CommandError(f'Строка {number}: не указан автор')
+        return item
+
+    def resolve_authors(self, usernames):
+        """Id авторов пачки, уже известные авторы не запрашиваются."""
+        missing = set(usernames) - set(self.authors)
+        if missing:
+            self.authors.update(
+                get_user_model().objects.filter(
+                    username__in=missing
+                ).values_list('username', 'id')
+            )
+        unknown = missing - set(self.authors)
+        if unknown:
+            raise CommandError(
+                'Неизвестные авторы: ' + ', '.join(sorted(unknown))
+            )
+
+    def import_batch(self, batch, max_length):
+        items = [self.parse(number, line) for number, line in batch]
+        self.resolve_authors(item['author'] for item in items)
+        title_default = Note._meta.get_field('title').get_default()
+        for item in items:
+            item.setdefault('title', title_default)
+        bases = [
+            item.get('slug') or base
+            for item, base in zip(items, slug_bases(
+                [item['title'] for item in items], max_length
+            ))
+        ]
+        # bulk_create не вызывает Note.save(), поэтому slug подбираются
+        # здесь; при гонке с другой записью подбираем их заново.
+        for attempt in range(SLUG_ATTEMPTS):
+            slugs = allocate_slugs(Note.objects.all(), bases, max_length)
+            notes = [
+                Note(
+                    title=item['title'],
+                    text=item['text'],
+                    slug=slug,
+                    author_id=self.authors[item['author']],
+                )
+                for item, slug in zip(items, slugs)
+            ]
+            try:
+                with transaction.atomic():
+                    Note.objects.bulk_create(notes)
+                    # SQLite не возвращает id после bulk_create,
+                    # находим новые заметки по уникальным slug.
+                    created = list(Note.objects.filter(slug__in=slugs))
+                    search.index_notes(created)
+                    revisions.record_initial_revisions(created)
+                for author_id in {note.author_id for note in notes}:
+                    cache.invalidate_author(author_id)
+                return len(notes)
+            except IntegrityError:
+                if attempt == SLUG_ATTEMPTS - 1:
+                    raise
@@ -0,0 +1,234 @@
+import asyncio
+import logging
+import re
+from contextlib import contextmanager
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+from .compression import compress, compress_stream
+from .db import QueryCounter, current_counter
+from .router import replica_request
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class AsyncCapableMiddleware:
+    """
+    Middleware, работающее и в синхронной, и в асинхронной цепочке.
+
+    В отличие от MiddlewareMixin, в асинхронной цепочке обработка не
+    уходит в поток через sync_to_async: подклассы задают around() -
+    контекст, в котором вызывается следующий обработчик, и
+    process_response(), которые не блокируют цикл событий.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Как в MiddlewareMixin: Django узнаёт асинхронный
+            # обработчик по этой отметке.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        with self.around(request) as state:
+            response = self.get_response(request)
+        return self.process_response(request, response, state)
+
+    async def __acall__(self, request):
+        with self.around(request) as state:
+            response = await self.get_response(request)
+        return self.process_response(request, response, state)
+
+    @contextmanager
+    def around(self, request):
+        yield None
+
+    def process_response(self, request, response, state):
+        return response
+
+
+class QueryCountMiddleware(AsyncCapableMiddleware):
+    """
+    Считает запросы к базе и их суммарное время для каждого маршрута.
+
+    Результат пишется в лог с именем маршрута, например notes:detail.
+    Если для маршрута задан бюджет в QUERY_BUDGETS и он превышен,
+    пишется предупреждение, а при QUERY_BUDGET_ENFORCE — выбрасывается
+    QueryBudgetExceeded, чтобы тесты падали на N+1.
+    Запросы потокового ответа учитываются по мере его чтения, и
+    итог пишется после последней части.
+    """
+
+    @contextmanager
+    def around(self, request):
+        counter = QueryCounter()
+        token = current_counter.set(counter)
+        try:
+            yield counter
+        finally:
+            current_counter.reset(token)
+
+    def process_response(self, request, response, counter):
+        if response.streaming:
+            response.streaming_content = self.count_stream(
+                request, counter, response.streaming_content
+            )
+        else:
+            self.report(request, counter)
+        return response
+
+    def count_stream(self, request, counter, content):
+        """
+        Отдаёт части ответа, учитывая запросы при их получении.
+
+        Счётчик выставляется только на время получения части: между
+        частями управление у сервера, и его запросы не учитываются.
+        """
+        content = iter(content)
+        while True:
+            token = current_counter.set(counter)
+            try:
+                chunk = next(content)
+            except StopIteration:
+                break
+            finally:
+                current_counter.reset(token)
+            yield chunk
+        self.report(request, counter)
+
+    def report(self, request, counter):
+        match = request.resolver_match
+        view_name = match.view_name if match else request.path
+        logger.info(
+            '%s %s: %d queries, %.1f ms', request.method, view_name,
+            counter.count, counter.duration * 1000
+        )
+        budget = settings.QUERY_BUDGETS.get(view_name)
+        if budget is not None and counter.count > budget:
+            message = (
+                f'{request.method} {view_name}: {counter.count} queries, '
+                f'budget is {budget}'
+            )
+            if settings.QUERY_BUDGET_ENFORCE:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+
+
+# Cookie, по которой запросы пользователя читают с основной базы.
+PIN_COOKIE = 'db_primary'
+# Методы, которые не изменяют данные, как в CsrfViewMiddleware.
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+
+class ReplicaMiddleware(AsyncCapableMiddleware):
+    """
+    Отправляет чтение маршрутов из REPLICA_READ_VIEWS на реплики.
+
+    После небезопасного запроса пользователь получает cookie и
+    REPLICA_PIN_SECONDS секунд, но не меньше допустимого отставания
+    реплик, читает с основной базы, чтобы после редиректа увидеть
+    свои изменения, которые ещё не дошли до реплик.
+    """
+
+    @contextmanager
+    def around(self, request):
+        allowed = (
+            request.method in SAFE_METHODS
+            and PIN_COOKIE not in request.COOKIES
+        )
+        token = replica_request.set(request if allowed else None)
+        try:
+            yield
+        finally:
+            replica_request.reset(token)
+
+    def process_response(self, request, response, state):
+        if request.method not in SAFE_METHODS and settings.REPLICA_DATABASES:
+            # Маршрутизатор берёт реплики, отставшие не больше чем на
+            # REPLICA_MAX_LAG по замеру не старше интервала проверки.
+            max_lag = settings.REPLICA_MAX_LAG + (
+                settings.REPLICA_LAG_CHECK_INTERVAL
+            )
+            response.set_cookie(
+                PIN_COOKIE, '1',
+                max_age=max(settings.REPLICA_PIN_SECONDS, max_lag),
+                httponly=True, samesite='Lax',
+            )
+        return response
+
+
+ACCEPTS_GZIP = re.compile(r'\bgzip\b')
+
+
+class CompressionMiddleware(AsyncCapableMiddleware):
+    """
+    Сжимает ответы gzip, потоковые - по частям.
+
+    Не сжимаются ответы клиентам без gzip в Accept-Encoding, уже
+    сжатые ответы, типы не из COMPRESSION_TYPES и тела короче
+    COMPRESSION_MIN_SIZE. Сжатые тела страниц с ETag или
+    Last-Modified кешируются; время сжатия уходит в Server-Timing,
+    доля сжатия и время всего - в compression.compression_stats().
+    В асинхронной цепочке тело сжимается в пуле потоков: сжатие
+    и кеш сжатых тел блокировали бы цикл событий.
+    """
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if response.streaming or not self.should_compress(request, response):
+            return self.process_response(request, response, None)
+        return await sync_to_async(
+            self.process_response, thread_sensitive=False
+        )(request, response, None)
+
+    def process_response(self, request, response, state):
+        if not self.should_compress(request, response):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if response.streaming:
+            response.streaming_content = compress_stream(
+                response.streaming_content
+            )
+            del response['Content-Length']
+        else:
+            cacheable = (
+                response.has_header('ETag')
+                or response.has_header('Last-Modified')
+            ) and 'no-store' not in response.get('Cache-Control', '')
+            compressed, cpu = compress(response.content, cacheable)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+            response['Server-Timing'] = f'gzip;dur={cpu * 1000:.2f}'
+        # Как в GZipMiddleware: сжатое тело побайтно отличается от
+        # исходного, поэтому сильный ETag становится слабым.
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = 'gzip'
+        return response
+
+    def should_compress(self, request, response):
+        if response.has_header('Content-Encoding'):
+            return False
+        accept_encoding = request.META.get('HTTP_ACCEPT_ENCODING', '')
+        if not ACCEPTS_GZIP.search(accept_encoding):
+            return False
+        if not response.get('Content-Type', '').startswith(
+                settings.COMPRESSION_TYPES
+        ):
+            return False
+        return response.streaming or (
+            len(response.content) >= settings.COMPRESSION_MIN_SIZE
+        )
@@ -0,0 +1,37 @@
+# Generated by Django 3.2.15 on 2026-10-18 04:10
+
+from django.db import migrations
+
+CREATE_INDEX_SQL = (
+    'CREATE VIRTUAL TABLE IF NOT EXISTS notes_search USING fts5('
+    'title, text, owner, '
+    "tokenize='unicode61 remove_diacritics 2')",
+    # Заголовок важнее текста, колонка автора в ранге не участвует.
+    "INSERT INTO notes_search (notes_search, rank) "
+    "VALUES ('rank', 'bm25(10.0, 1.0, 0.0)')",
+    'INSERT INTO notes_search (rowid, title, text, owner) '
+    "SELECT id, title, text, 'u' || author_id FROM notes_note",
+)
+
+
+def create_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in CREATE_INDEX_SQL:
+        schema_editor.execute(sql)
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS notes_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0003_note_author_id_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 3.2.15 on 2026-10-18 02:41
+
+import zlib
+from itertools import islice
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+BATCH_SIZE = 500
+
+
+def snapshot_notes(apps, schema_editor):
+    """Первая версия для уже существующих заметок."""
+    Note = apps.get_model('notes', 'Note')
+    NoteRevision = apps.get_model('notes', 'NoteRevision')
+    notes = Note.objects.only('id', 'title', 'text').iterator(BATCH_SIZE)
+    while True:
+        revisions = [
+            NoteRevision(
+                note=note, number=1, title=note.title, is_snapshot=True,
+                data=zlib.compress(note.text.encode()),
+            )
+            for note in islice(notes, BATCH_SIZE)
+        ]
+        if not revisions:
+            break
+        NoteRevision.objects.bulk_create(revisions)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0004_notes_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NoteRevision',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveIntegerField(verbose_name='Номер версии')),
+                ('title', models.CharField(max_length=100, verbose_name='Заголовок')),
+                ('is_snapshot', models.BooleanField(default=False)),
+                ('data', models.BinaryField()),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('note', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='revisions', to='notes.note')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='noterevision',
+            constraint=models.UniqueConstraint(fields=('note', 'number'), name='note_revision_number_uniq'),
+        ),
+        migrations.RunPython(snapshot_notes, migrations.RunPython.noop),
+    ]
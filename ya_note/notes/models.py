@@ -1,7 +1,11 @@
 from django.conf import settings
-from django.db import models
+from django.db import IntegrityError, models, transaction
 
-from pytils.translit import slugify
+from .fields import CompressedTextField
+from .slugs import allocate_slugs, slug_base
+
+# Сколько раз подбирать slug заново, если его успели занять.
+SLUG_ATTEMPTS = 3
 
 
 class Note(models.Model):
@@ -11,7 +15,7 @@ class Note(models.Model):
         default='Название заметки',
         help_text='Дайте короткое название заметке'
     )
-    text = models.TextField(
+    text = CompressedTextField(
         'Текст',
         help_text='Добавьте подробностей'
     )
@@ -27,12 +31,66 @@ class Note(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
     )
+    modified = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = (
+            models.Index(fields=('author', 'id'), name='note_author_id_idx'),
+        )
 
     def __str__(self):
         return self.title
 
     def save(self, *args, **kwargs):
-        if not self.slug:
-            max_slug_length = self._meta.get_field('slug').max_length
-            self.slug = slugify(self.title)[:max_slug_length]
-        super().save(*args, **kwargs)
+        """
+        Если slug не задан, подбираем уникальный по заголовку.
+
+        Между подбором и INSERT параллельный запрос может занять тот же
+        slug, тогда ловим IntegrityError и подбираем slug заново.
+        """
+        if self.slug:
+            return super().save(*args, **kwargs)
+        max_length = self._meta.get_field('slug').max_length
+        for attempt in range(SLUG_ATTEMPTS):
+            self.slug, = allocate_slugs(
+                type(self)._default_manager.all(),
+                [slug_base(self.title, max_length)],
+                max_length,
+                exclude_pk=self.pk,
+            )
+            try:
+                with transaction.atomic():
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                self.slug = ''
+                if attempt == SLUG_ATTEMPTS - 1:
+                    raise
+
+
+class NoteRevision(models.Model):
+    """
+    Версия заметки.
+
+    Текст хранится либо целиком (снимок), либо сжатой разницей
+    с предыдущей версией; подробности в notes.revisions.
+    """
+    note = models.ForeignKey(
+        Note,
+        on_delete=models.CASCADE,
+        related_name='revisions',
+    )
+    number = models.PositiveIntegerField('Номер версии')
+    title = models.CharField('Заголовок', max_length=100)
+    is_snapshot = models.BooleanField(default=False)
+    data = models.BinaryField()
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=('note', 'number'), name='note_revision_number_uniq'
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.note_id}#{self.number}'
@@ -0,0 +1,203 @@
+import itertools
+import json
+import logging
+import re
+import zlib
+from collections import defaultdict
+from difflib import SequenceMatcher
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import OuterRef, Subquery
+
+from .models import NoteRevision
+
+logger = logging.getLogger(__name__)
+
+# Слово вместе с пробелами после него: слова склеиваются обратно
+# в исходную строку без потерь.
+WORD = re.compile(r'\S+\s*|\s+')
+# Сколько раз пересчитывать версию, если её номер занял
+# параллельный запрос.
+SAVE_ATTEMPTS = 3
+
+
+def _opcodes(base_parts, parts, start, autojunk):
+    """
+    Правки SequenceMatcher со смещениями в символах base.
+
+    start - смещение первой части base_parts; новые части
+    склеиваются в строку.
+    """
+    offsets = list(itertools.accumulate(map(len, base_parts), initial=start))
+    matcher = SequenceMatcher(None, base_parts, parts, autojunk=autojunk)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        yield tag, offsets[i1], offsets[i2], ''.join(parts[j1:j2])
+
+
+def _append(ops, tag, start, end, new):
+    """Добавляет правку, склеивая её с такой же предыдущей."""
+    if tag == 'equal':
+        if ops and not isinstance(ops[-1], str) and ops[-1][1] == start:
+            ops[-1][1] = end
+        else:
+            ops.append([start, end])
+    elif new:
+        if ops and isinstance(ops[-1], str):
+            ops[-1] += new
+        else:
+            ops.append(new)
+
+
+def make_delta(base, text):
+    """
+    Разница text с base в виде сжатого JSON.
+
+    Сначала сравниваются строки, а заменённые строки - ещё раз
+    по словам, чтобы правка в длинной строке не записывала её целиком.
+    Неизменные участки записываются парой смещений символов base,
+    новый текст - строкой, поэтому размер разницы зависит
+    от размера правки, а не от длины заметки.
+    """
+    ops = []
+    for tag, start, end, new in _opcodes(
+            base.splitlines(keepends=True), text.splitlines(keepends=True),
+            0, autojunk=False,
+    ):
+        if tag != 'replace':
+            _append(ops, tag, start, end, new)
+            continue
+        # Частые слова (autojunk) не сопоставляются: иначе сравнение
+        # длинного текста по словам становится квадратичным.
+        for word_op in _opcodes(
+                WORD.findall(base[start:end]), WORD.findall(new),
+                start, autojunk=True,
+        ):
+            _append(ops, *word_op)
+    return zlib.compress(
+        json.dumps(ops, ensure_ascii=False).encode()
+    )
+
+
+def apply_delta(base, delta):
+    """Текст по base и разнице make_delta()."""
+    return ''.join(
+        op if isinstance(op, str) else base[op[0]:op[1]]
+        for op in json.loads(zlib.decompress(delta))
+    )
+
+
+def make_snapshot(text):
+    return zlib.compress(text.encode())
+
+
+def _chains(note_ids, number=None):
+    """
+    Версии от ближайшего снимка до number включительно, одним запросом.
+
+    Снимок делается не реже, чем раз в NOTE_REVISION_SNAPSHOT_EVERY
+    версий, поэтому цепочка, а с ней и время восстановления,
+    ограничены независимо от длины истории.
+    """
+    revisions = NoteRevision.objects.filter(note_id__in=note_ids)
+    if number is not None:
+        revisions = revisions.filter(number__lte=number)
+    snapshot = revisions.filter(
+        note_id=OuterRef('note_id'), is_snapshot=True
+    ).order_by('-number').values('number')[:1]
+    chains = defaultdict(list)
+    for revision in revisions.filter(
+            number__gte=Subquery(snapshot)
+    ).order_by('note_id', 'number'):
+        chains[revision.note_id].append(revision)
+    return chains
+
+
+def _text(chain):
+    text = zlib.decompress(chain[0].data).decode()
+    for revision in chain[1:]:
+        text = apply_delta(text, revision.data)
+    return text
+
+
+def get_revision(note, number):
+    """Версия заметки с восстановленным текстом или None."""
+    chain = _chains([note.pk], number)[note.pk]
+    if not chain or chain[-1].number != number:
+        return None
+    revision = chain[-1]
+    revision.text = _text(chain)
+    return revision
+
+
+def _next_revision(note, chain):
+    """
+    Новая версия заметки по цепочке предыдущих, ещё не сохранённая.
+
+    Версия не создаётся, если заголовок и текст не изменились.
+    Снимок пишется для первой версии, каждые
+    NOTE_REVISION_SNAPSHOT_EVERY версий и тогда, когда разница
+    получилась не меньше самого снимка.
+    """
+    if not chain:
+        return NoteRevision(
+            note=note, number=1, title=note.title, is_snapshot=True,
+            data=make_snapshot(note.text),
+        )
+    last = chain[-1]
+    previous = _text(chain)
+    if previous == note.text and last.title == note.title:
+        return None
+    snapshot = make_snapshot(note.text)
+    data = make_delta(previous, note.text)
+    is_snapshot = (
+        len(chain) >= settings.NOTE_REVISION_SNAPSHOT_EVERY
+        or len(data) >= len(snapshot)
+    )
+    return NoteRevision(
+        note=note, number=last.number + 1, title=note.title,
+        is_snapshot=is_snapshot, data=snapshot if is_snapshot else data,
+    )
+
+
+def record_revision(note, created=False):
+    """
+    Сохраняет текущее состояние заметки как новую версию.
+
+    Для только что созданной заметки предыдущие версии не ищутся.
+    Если номер версии успел занять параллельный запрос, цепочка
+    перечитывается и версия строится заново.
+    """
+    chain = [] if created else _chains([note.pk])[note.pk]
+    for _ in range(SAVE_ATTEMPTS):
+        revision = _next_revision(note, chain)
+        if revision is None:
+            return None
+        try:
+            with transaction.atomic():
+                revision.save()
+        except IntegrityError:
+            chain = _chains([note.pk])[note.pk]
+        else:
+            return revision
+    logger.warning('Revision of note %s is not saved', note.pk)
+    return None
+
+
+def record_revisions(notes):
+    """Версии для списка изменённых заметок: два запроса на всю пачку."""
+    chains = _chains([note.pk for note in notes])
+    NoteRevision.objects.bulk_create(filter(None, (
+        _next_revision(note, chains[note.pk]) for note in notes
+    )))
+
+
+def record_initial_revisions(notes):
+    """Первые версии для заметок, созданных через bulk_create."""
+    NoteRevision.objects.bulk_create(
+        NoteRevision(
+            note=note, number=1, title=note.title, is_snapshot=True,
+            data=make_snapshot(note.text),
+        )
+        for note in notes
+    )
@@ -0,0 +1,149 @@
+import base64
+import binascii
+import json
+import math
+import re
+
+from django.db import connection
+from django.utils.html import escape
+
+from .db import SQL_INTEGER_MAX, SQL_INTEGER_MIN
+from .fields import SQL_FUNCTION
+
+# Полнотекстовый индекс SQLite FTS5 по заметкам, таблица создаётся
+# миграцией 0004_notes_search. rowid совпадает с id заметки, а колонка
+# owner хранит токен автора: фильтр по автору выполняется самим
+# индексом, а не перебором совпадений всех пользователей.
+TABLE = 'notes_search'
+MARK_START, MARK_END = '\x02', '\x03'
+TOKEN = re.compile(r'\w+')
+
+SEARCH_SQL = (
+    f'SELECT rowid, rank, '
+    f"snippet({TABLE}, -1, '{MARK_START}', '{MARK_END}', '…', 16) "
+    f'FROM {TABLE} WHERE {TABLE} MATCH %s{{after}} '
+    f'ORDER BY rank, rowid LIMIT %s'
+)
+AFTER_SQL = ' AND (rank > %s OR (rank = %s AND rowid > %s))'
+REBUILD_SQL = (
+    f'DELETE FROM {TABLE}',
+    f'INSERT INTO {TABLE} (rowid, title, text, owner) '
+    f"SELECT id, title, {SQL_FUNCTION}(text), 'u' || author_id "
+    f'FROM notes_note',
+)
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def is_available():
+    """Индекс есть только у SQLite, на других СУБД поиск выключен."""
+    return connection.vendor == 'sqlite'
+
+
+def owner_token(author_id):
+    return f'u{author_id}'
+
+
+def index_notes(notes):
+    if not is_available():
+        return
+    rows = [
+        (note.pk, note.title, note.text, owner_token(note.author_id))
+        for note in notes
+    ]
+    with connection.cursor() as cursor:
+        # FTS5 при REPLACE удаляет из индекса и старые токены строки.
+        cursor.executemany(
+            f'INSERT OR REPLACE INTO {TABLE} (rowid, title, text, owner) '
+            'VALUES (%s, %s, %s, %s)',
+            rows
+        )
+
+
+def unindex_note(pk):
+    if is_available():
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', (pk,))
+
+
+def unindex_notes(pks):
+    if is_available():
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'DELETE FROM {TABLE} WHERE rowid = %s', [(pk,) for pk in pks]
+            )
+
+
+def rebuild():
+    with connection.cursor() as cursor:
+        for sql in REBUILD_SQL:
+            cursor.execute(sql)
+
+
+def to_match_query(query, author_id):
+    """
+    Запрос FTS5 по заголовку и тексту заметок одного автора.
+
+    Каждое слово ищется как префикс, синтаксис FTS5 из ввода
+    пользователя экранируется.
+    """
+    tokens = ' '.join(f'"{token}"*' for token in TOKEN.findall(query))
+    if not tokens:
+        return None
+    return f'owner:"{owner_token(author_id)}" AND {{title text}}: ({tokens})'
+
+
+def encode_cursor(rank, rowid):
+    raw = json.dumps([rank, rowid]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        rank, rowid = json.loads(raw)
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        raise InvalidCursor(cursor)
+    if (
+        not isinstance(rank, float) or not math.isfinite(rank)
+        or not isinstance(rowid, int) or isinstance(rowid, bool)
+        or not SQL_INTEGER_MIN <= rowid <= SQL_INTEGER_MAX
+    ):
+        raise InvalidCursor(cursor)
+    return rank, rowid
+
+
+def highlight(snippet):
+    return escape(snippet).replace(
+        MARK_START, '<mark>'
+    ).replace(MARK_END, '</mark>')
+
+
+def search(query, author_id, size, cursor=None):
+    """
+    Найденные заметки автора: список пар (id, фрагмент) и курсор.
+
+    Результаты отсортированы по bm25 с весом заголовка выше текста;
+    курсор хранит ранг и id последней заметки страницы.
+    """
+    match = to_match_query(query, author_id)
+    if match is None or not is_available():
+        return [], None
+    after, params = '', [match]
+    if cursor:
+        rank, rowid = decode_cursor(cursor)
+        after, params = AFTER_SQL, [match, rank, rank, rowid]
+    with connection.cursor() as db_cursor:
+        db_cursor.execute(
+            SEARCH_SQL.format(after=after), params + [size + 1]
+        )
+        rows = db_cursor.fetchall()
+    next_cursor = None
+    if len(rows) > size:
+        rows = rows[:size]
+        next_cursor = encode_cursor(rows[-1][1], rows[-1][0])
+    return [(rowid, highlight(snippet)) for rowid, _, snippet in rows], (
+        next_cursor
+    )
@@ -0,0 +1,42 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import cache, revisions, search
+from .models import Note
+
+_muted = ContextVar('notes_signals_muted', default=False)
+
+
+@contextmanager
+def muted():
+    """
+    Отключает обработчики на время пакетной операции.
+
+    Пакетная операция сама обновляет версии, индекс и кеш
+    одним запросом на всю пачку, а не на каждую заметку.
+    """
+    token = _muted.set(True)
+    try:
+        yield
+    finally:
+        _muted.reset(token)
+
+
+@receiver(post_save, sender=Note)
+def note_saved(sender, instance, created, **kwargs):
+    if _muted.get():
+        return
+    revisions.record_revision(instance, created)
+    search.index_notes([instance])
+    cache.invalidate_author(instance.author_id)
+
+
+@receiver(post_delete, sender=Note)
+def note_deleted(sender, instance, **kwargs):
+    if _muted.get():
+        return
+    search.unindex_note(instance.pk)
+    cache.invalidate_author(instance.author_id)
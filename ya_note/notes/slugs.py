@@ -0,0 +1,84 @@
+from django.db.models import Q
+
+from .translit import slugify, slugify_many
+
+DEFAULT_SLUG = 'note'
+# Место под суффикс вида -12345: его хватит на любые коллизии.
+SUFFIX_RESERVE = 11
+# SQLite ограничивает глубину выражения, поэтому префиксы
+# запрашиваются порциями.
+PREFIXES_PER_QUERY = 300
+# Больше любого символа, допустимого в slug: граница диапазона префикса.
+PREFIX_UPPER_BOUND = '\x7f'
+
+
+def slug_base(title, max_length):
+    """Slug из заголовка без учёта уникальности."""
+    return slugify(title)[:max_length] or DEFAULT_SLUG
+
+
+def slug_bases(titles, max_length):
+    """slug_base() для списка заголовков за один вызов slugify_many()."""
+    return [
+        slug[:max_length] or DEFAULT_SLUG for slug in slugify_many(titles)
+    ]
+
+
+def is_slug_taken(queryset, slug, exclude_pk=None):
+    found = queryset.filter(slug=slug)
+    if exclude_pk is not None:
+        found = found.exclude(pk=exclude_pk)
+    return found.exists()
+
+
+def _taken_slugs(queryset, prefixes, exclude_pk):
+    """
+    Все занятые slug, начинающиеся с одного из префиксов.
+
+    Префикс ищется диапазоном от prefix до prefix + PREFIX_UPPER_BOUND,
+    а не через LIKE, чтобы SQLite использовал уникальный индекс по slug.
+    """
+    taken = set()
+    prefixes = sorted(prefixes)
+    for start in range(0, len(prefixes), PREFIXES_PER_QUERY):
+        condition = Q()
+        for prefix in prefixes[start:start + PREFIXES_PER_QUERY]:
+            condition |= Q(
+                slug__gte=prefix, slug__lt=prefix + PREFIX_UPPER_BOUND
+            )
+        found = queryset.filter(condition)
+        if exclude_pk is not None:
+            found = found.exclude(pk=exclude_pk)
+        taken.update(found.values_list('slug', flat=True))
+    return taken
+
+
+def allocate_slugs(queryset, bases, max_length, exclude_pk=None,
+                   reserved=()):
+    """
+    Подбирает уникальные slug для списка заготовок.
+
+    Занятые slug с нужными префиксами выбираются одним запросом
+    (на каждые PREFIXES_PER_QUERY префиксов), коллизии — в том числе
+    внутри самого списка — разрешаются суффиксами -2, -3 и т.д.
+    Slug из reserved считаются занятыми, даже если их ещё нет в базе.
+    """
+    bases = [base[:max_length] for base in bases]
+    taken = _taken_slugs(
+        queryset,
+        {base[:max_length - SUFFIX_RESERVE] for base in bases},
+        exclude_pk,
+    ) | set(reserved)
+    next_number = {}
+    slugs = []
+    for base in bases:
+        slug = base
+        number = next_number.get(base, 1)
+        while slug in taken:
+            number += 1
+            suffix = f'-{number}'
+            slug = base[:max_length - len(suffix)] + suffix
+        next_number[base] = number
+        taken.add(slug)
+        slugs.append(slug)
+    return slugs
@@ -0,0 +1,30 @@
+from pathlib import Path
+
+from django.template import engines
+
+
+def template_names(engine):
+    """Имена всех шаблонов из каталогов DIRS движка."""
+    names = []
+    for directory in map(Path, engine.dirs):
+        names.extend(
+            path.relative_to(directory).as_posix()
+            for path in sorted(directory.rglob('*'))
+            if path.is_file()
+        )
+    return names
+
+
+def warm_up(engine=None):
+    """
+    Компилирует все шаблоны из DIRS заранее.
+
+    С загрузчиком cached скомпилированные шаблоны остаются в его
+    кеше, и первые запросы после запуска не разбирают шаблоны.
+    Возвращает число скомпилированных шаблонов.
+    """
+    engine = engine or engines['django'].engine
+    names = template_names(engine)
+    for name in names:
+        engine.get_template(name)
+    return len(names)
@@ -1,19 +1,31 @@
+import math
+from http import HTTPStatus
+
+from asgiref.sync import async_to_sync
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache, caches
+from django.http import Http404, HttpResponseNotFound
+from django.test import Client, RequestFactory, TestCase, override_settings
 from django.urls import reverse
 
+from notes import async_views, search
 from notes.forms import NoteForm
 from notes.models import Note
 
 User = get_user_model()
 
 
+@override_settings(QUERY_BUDGET_ENFORCE=True)
 class TestContent(TestCase):
     """Класс тестирования контента."""
 
     @classmethod
     def setUpTestData(cls):
         """Фикстуры."""
+        # id пользователей повторяются после отката базы, а кеш
+        # пользователей и сессий - нет.
+        caches['sessions'].clear()
         cls.author = User.objects.create(username='author')
         cls.author_client = Client()
         cls.author_client.force_login(cls.author)
@@ -28,6 +40,10 @@ class TestContent(TestCase):
             author=cls.author
         )
 
+    def setUp(self):
+        """Кеш не откатывается вместе с базой между тестами."""
+        cache.clear()
+
     def test_notes_list_for_different_users(self):
         """
         Тест списка заметок для различных пользователей.
@@ -59,3 +75,155 @@ class TestContent(TestCase):
                 response = self.author_client.get(url)
                 self.assertIn('form', response.context)
                 self.assertIsInstance(response.context['form'], NoteForm)
+
+    def test_detail_conditional_get(self):
+        """
+        Страница заметки отвечает 304, пока заметка не изменилась.
+
+        Изменение заметки меняет её ETag.
+        """
+        url = reverse('notes:detail', args=(self.note.slug,))
+        etag = self.author_client.get(url)['ETag']
+        response = self.author_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        self.note.text = 'Новый текст'
+        self.note.save()
+        response = self.author_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_notes_list_keyset_pagination(self):
+        """
+        Список заметок листается по курсору ?after=.
+
+        Каждая заметка попадает в список один раз, поле text не грузится.
+        """
+        Note.objects.bulk_create(
+            Note(title=f'Заметка {index}', text='Текст',
+                 slug=f'note-{index}', author=self.author)
+            for index in range(4)
+        )
+        url = reverse('notes:list')
+        seen = []
+        params = {}
+        with self.settings(NOTES_COUNT_ON_PAGE=2):
+            while True:
+                response = self.author_client.get(url, params)
+                object_list = response.context['object_list']
+                self.assertLessEqual(len(object_list), 2)
+                seen.extend(object_list)
+                if not response.context['next_cursor']:
+                    break
+                params = {'after': response.context['next_cursor']}
+        self.assertEqual(
+            seen, list(Note.objects.filter(author=self.author).order_by('id'))
+        )
+        self.assertIn('text', seen[0].get_deferred_fields())
+
+    def test_notes_list_rejects_bad_cursor(self):
+        """Нечисловой курсор и число вне диапазона SQLite дают 404."""
+        url = reverse('notes:list')
+        for after in ('abc', 2 ** 70, -2 ** 70):
+            with self.subTest(after=after):
+                response = self.author_client.get(url, {'after': after})
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_search_own_notes(self):
+        """
+        Поиск находит только заметки пользователя.
+
+        Индекс обновляется при изменении и удалении заметки.
+        """
+        url = reverse('notes:search')
+        Note.objects.create(
+            title='Чужая', text='Текст про кабачки', author=self.not_author
+        )
+        self.note.text = 'Рецепт кабачков'
+        self.note.save()
+        response = self.author_client.get(url, {'q': 'кабачк'})
+        object_list = response.context['object_list']
+        self.assertEqual(object_list, [self.note])
+        self.assertIn('<mark>', object_list[0].snippet)
+        self.note.delete()
+        response = self.author_client.get(url, {'q': 'кабачк'})
+        self.assertEqual(response.context['object_list'], [])
+
+    def test_search_rejects_bad_cursor(self):
+        """Курсор поиска вне диапазона SQLite или с NaN даёт 404."""
+        url = reverse('notes:search')
+        for rank, rowid in ((-1.0, 2 ** 70), (math.nan, 1), (-1.0, True)):
+            with self.subTest(rank=rank, rowid=rowid):
+                response = self.author_client.get(url, {
+                    'q': 'Текст', 'after': search.encode_cursor(rank, rowid)
+                })
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_list_and_detail_are_cached_per_author(self):
+        """
+        Повторные список и заметка читаются из кеша автора.
+
+        Изменение заметки сбрасывает кеш только её автора.
+        """
+        list_url = reverse('notes:list')
+        detail_url = reverse('notes:detail', args=(self.note.slug,))
+        self.author_client.get(list_url)
+        self.author_client.get(detail_url)
+        self.not_author_client.get(list_url)
+        # Сессия и пользователь тоже берутся из кеша.
+        with self.assertNumQueries(0):
+            self.author_client.get(list_url)
+        with self.assertNumQueries(0):
+            response = self.author_client.get(detail_url)
+        self.assertEqual(response.context['object'], self.note)
+        self.note.title = 'Новый заголовок'
+        self.note.save()
+        response = self.author_client.get(list_url)
+        self.assertEqual(
+            response.context['object_list'][0].title, 'Новый заголовок'
+        )
+        response = self.author_client.get(detail_url)
+        self.assertEqual(response.context['object'].title, 'Новый заголовок')
+        with self.assertNumQueries(0):
+            self.not_author_client.get(list_url)
+
+    @override_settings(ASYNC_DB_POOL_SIZE=0)
+    def test_async_views_match_sync(self):
+        """
+        Асинхронные список и заметка отдают то же, что синхронные.
+
+        Чужая заметка даёт 404, анонима перенаправляют на вход.
+        """
+        factory = RequestFactory()
+        detail_url = reverse('notes:detail', args=(self.note.slug,))
+        cases = (
+            (self.author, async_views.note_detail, detail_url,
+             {'slug': self.note.slug}, HTTPStatus.OK),
+            (self.not_author, async_views.note_detail, detail_url,
+             {'slug': self.note.slug}, HTTPStatus.NOT_FOUND),
+            (AnonymousUser(), async_views.note_detail, detail_url,
+             {'slug': self.note.slug}, HTTPStatus.FOUND),
+            (self.author, async_views.notes_list, reverse('notes:list'),
+             {}, HTTPStatus.OK),
+            (AnonymousUser(), async_views.notes_list, reverse('notes:list'),
+             {}, HTTPStatus.FOUND),
+            (self.author, async_views.notes_list,
+             reverse('notes:list') + f'?after={2 ** 70}',
+             {}, HTTPStatus.NOT_FOUND),
+        )
+        for user, view, url, kwargs, status in cases:
+            with self.subTest(user=user, url=url):
+                request = factory.get(url)
+                request.user = user
+                try:
+                    response = async_to_sync(view)(request, **kwargs)
+                except Http404:
+                    response = HttpResponseNotFound()
+                self.assertEqual(response.status_code, status)
+        request = factory.get(detail_url)
+        request.user = self.author
+        response = async_to_sync(async_views.note_detail)(
+            request, slug=self.note.slug
+        )
+        self.assertContains(response, self.note.text)
+        self.assertEqual(
+            response['ETag'], self.author_client.get(detail_url)['ETag']
+        )
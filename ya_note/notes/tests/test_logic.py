@@ -1,22 +1,54 @@
+import gzip
+import importlib
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
 from http import HTTPStatus
+from io import StringIO
+from pathlib import Path
+from unittest import mock
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from pytils.translit import slugify
 
+from notes import db, revisions, search
+from notes.compression import compression_stats, reset_compression_stats
 from notes.forms import WARNING
-from notes.models import Note
+from notes.management.commands.bench_templates import build_engine
+from notes.middleware import PIN_COOKIE
+from notes.models import Note, NoteRevision
+from notes.revisions import (
+    get_revision, make_snapshot, record_initial_revisions
+)
+from notes.router import ReplicaRouter, read_from_replicas
+from notes.slugs import allocate_slugs
+from notes.template_cache import template_names, warm_up
+from notes.translit import slugify as table_slugify
+from notes.translit import slugify_many
 
 User = get_user_model()
 
 
+@override_settings(QUERY_BUDGET_ENFORCE=True)
 class TestLogic(TestCase):
     """Класс тестирования логики."""
 
     @classmethod
     def setUpTestData(cls):
         """Фикстуры."""
+        # id пользователей повторяются после отката базы, а кеш
+        # пользователей и сессий - нет.
+        caches['sessions'].clear()
         cls.author = User.objects.create(username='author')
         cls.author_client = Client()
         cls.author_client.force_login(cls.author)
@@ -41,6 +73,11 @@ class TestLogic(TestCase):
             and note.slug == data['slug']
         )
 
+    def setUp(self):
+        """Кеш не откатывается вместе с базой между тестами."""
+        cache.clear()
+        reset_compression_stats()
+
     def test_user_can_create_note(self):
         """Залогиненный пользователь может создать заметку."""
         response = self.author_client.post(
@@ -147,3 +184,479 @@ class TestLogic(TestCase):
         self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
         self.note.refresh_from_db()
         self.assertFalse(self.equal_fields_note(self.note, self.data))
+
+    def test_edits_are_stored_as_revisions(self):
+        """
+        Правки сохраняются версиями, любую версию можно восстановить.
+
+        Небольшая правка длинной заметки хранится разницей, а снимок
+        пишется не реже, чем раз в NOTE_REVISION_SNAPSHOT_EVERY версий.
+        """
+        lines = [f'Строка {index}\n' for index in range(500)]
+        note = Note.objects.create(
+            title='Заголовок', text=''.join(lines), author=self.author
+        )
+        url = reverse('notes:edit', args=(note.slug,))
+        with self.settings(NOTE_REVISION_SNAPSHOT_EVERY=3):
+            for index in range(4):
+                lines[index * 100] = f'Правка {index}\n'
+                self.author_client.post(url, {
+                    'title': 'Заголовок', 'text': ''.join(lines),
+                    'slug': note.slug,
+                })
+        revisions = list(note.revisions.order_by('number'))
+        self.assertEqual(
+            [revision.is_snapshot for revision in revisions],
+            [True, False, False, True, False],
+        )
+        self.assertLess(len(revisions[1].data), len(revisions[0].data) / 10)
+        self.assertIn('Правка 1', get_revision(note, 3).text)
+        self.assertNotIn('Правка 2', get_revision(note, 3).text)
+        response = self.author_client.post(
+            reverse('notes:restore', args=(note.slug, 1))
+        )
+        self.assertRedirects(response, self.url_success)
+        note.refresh_from_db()
+        self.assertEqual(note.text, get_revision(note, 1).text)
+        self.assertEqual(NoteRevision.objects.filter(note=note).count(), 6)
+        response = self.not_author_client.post(
+            reverse('notes:restore', args=(note.slug, 1))
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_long_line_edit_is_stored_as_small_delta(self):
+        """Правка слова в длинной строке хранится разницей по словам."""
+        words = [f'слово{index}' for index in range(2000)]
+        note = Note.objects.create(
+            title='Заголовок', text=' '.join(words), author=self.author
+        )
+        words[1000] = 'правка'
+        note.text = ' '.join(words)
+        note.save()
+        revision = note.revisions.get(number=2)
+        self.assertFalse(revision.is_snapshot)
+        self.assertLess(len(revision.data), 100)
+        self.assertEqual(get_revision(note, 2).text, note.text)
+
+    @override_settings(QUERY_BUDGET_ENFORCE=False)
+    def test_revision_number_race_is_retried(self):
+        """Занятый параллельным запросом номер версии берётся заново."""
+        note = Note.objects.create(
+            title='Заголовок', text='Текст', author=self.author
+        )
+        next_revision = revisions._next_revision
+        raced = []
+
+        def racing_next_revision(note, chain):
+            revision = next_revision(note, chain)
+            if not raced:
+                raced.append(NoteRevision.objects.create(
+                    note=note, number=revision.number, title='Чужая',
+                    is_snapshot=True, data=make_snapshot('Чужой текст'),
+                ))
+            return revision
+
+        note.text = 'Новый текст'
+        with mock.patch.object(
+                revisions, '_next_revision', racing_next_revision
+        ):
+            url = reverse('notes:edit', args=(note.slug,))
+            response = self.author_client.post(url, {
+                'title': note.title, 'text': note.text, 'slug': note.slug,
+            })
+        self.assertRedirects(response, self.url_success)
+        self.assertEqual(get_revision(note, 2).text, 'Чужой текст')
+        self.assertEqual(get_revision(note, 3).text, 'Новый текст')
+
+    def test_empty_slug_collision_gets_suffix(self):
+        """Одинаковые заголовки без slug получают суффиксы -2, -3."""
+        self.data.pop('slug')
+        for _ in range(3):
+            self.author_client.post(self.url_add, self.data)
+        base = slugify(self.data['title'])
+        self.assertEqual(
+            sorted(Note.objects.values_list('slug', flat=True)),
+            [base, f'{base}-2', f'{base}-3'],
+        )
+
+    def test_allocate_slugs_for_batch(self):
+        """Slug для пачки заголовков подбираются одним запросом."""
+        Note.objects.create(
+            title='Заметка', text='Текст', slug='zametka', author=self.author
+        )
+        with self.assertNumQueries(1):
+            slugs = allocate_slugs(
+                Note.objects.all(), ['zametka', 'zametka', 'drugaya'], 100
+            )
+        self.assertEqual(slugs, ['zametka-2', 'zametka-3', 'drugaya'])
+
+    def test_slugify_matches_pytils(self):
+        """
+        Табличная транслитерация совпадает с pytils.
+
+        Проверяется на случайных строках из кириллицы, латиницы,
+        пробелов, дефисов, кавычек и прочих символов таблицы pytils.
+        """
+        symbols = (
+            'абвгдеёжзийклмнопрстуфхцчшщъыьэюя'
+            'АБВГДЕЁЖЗИЙКЛМНОПРСТУФХЦЧШЩЪЫЬЭЮЯ'
+            'azAZ09 -_&;.,!?\'"«»“”‘’–—−…№#`\t\nİßé\x00'
+        )
+        rng = random.Random(0)
+        titles = [
+            ''.join(rng.choice(symbols) for _ in range(rng.randint(0, 30)))
+            for _ in range(2000)
+        ] + ['&amp;', 'a &amp; b', 'Заметка']
+        expected = [slugify(title) for title in titles]
+        self.assertEqual([table_slugify(title) for title in titles], expected)
+        clean = [title.replace('\x00', '') for title in titles]
+        self.assertEqual(
+            slugify_many(clean), [slugify(title) for title in clean]
+        )
+        self.assertEqual(slugify_many(titles), expected)
+        self.assertEqual(slugify_many([]), [])
+
+    def test_save_retries_when_slug_is_taken(self):
+        """Если подобранный slug успели занять, он подбирается заново."""
+        Note.objects.create(
+            title='Заметка', text='Текст', slug='zametka', author=self.author
+        )
+        with mock.patch(
+                'notes.models.allocate_slugs',
+                side_effect=[['zametka'], ['zametka-2']],
+        ):
+            note = Note.objects.create(
+                title='Заметка', text='Текст', author=self.author
+            )
+        self.assertEqual(note.slug, 'zametka-2')
+
+    def test_import_and_export_notes(self):
+        """
+        Заметки импортируются из JSONL пачками и выгружаются обратно.
+
+        Одинаковые заголовки получают разные slug.
+        """
+        lines = [
+            {'title': 'Импорт', 'text': f'Текст {index}'}
+            for index in range(5)
+        ] + [{'title': 'Своя', 'text': 'Текст', 'slug': 'own',
+              'author': self.not_author.username}]
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / 'notes.jsonl'
+            path.write_text(
+                '\n'.join(json.dumps(line) for line in lines),
+                encoding='utf-8'
+            )
+            call_command(
+                'import_notes', str(path), author=self.author.username,
+                batch_size=2, stdout=StringIO()
+            )
+        self.assertEqual(Note.objects.filter(author=self.author).count(), 5)
+        self.assertEqual(
+            Note.objects.values('slug').distinct().count(), len(lines)
+        )
+        self.assertEqual(Note.objects.get(slug='own').author, self.not_author)
+        output = StringIO()
+        call_command('export_notes', stdout=output, stderr=StringIO())
+        exported = [
+            json.loads(line) for line in output.getvalue().splitlines()
+        ]
+        self.assertEqual(
+            sorted(row['text'] for row in exported),
+            sorted(line['text'] for line in lines),
+        )
+
+    def test_long_note_text_is_compressed(self):
+        """
+        Длинный текст заметки хранится сжатым.
+
+        Экспорт и поиск работают с исходным текстом.
+        """
+        text = 'Строка журнала\n' * 1000
+        note = Note.objects.create(
+            title='Журнал', text=text, author=self.author
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT typeof(text) FROM notes_note WHERE id = %s',
+                (note.id,)
+            )
+            self.assertEqual(cursor.fetchone(), ('blob',))
+        note = Note.objects.get(pk=note.pk)
+        self.assertIsInstance(note.__dict__['text'], bytes)
+        self.assertEqual(note.text, text)
+        output = StringIO()
+        call_command('export_notes', stdout=output, stderr=StringIO())
+        self.assertEqual(json.loads(output.getvalue())['text'], text)
+        search.rebuild()
+        hits, _ = search.search('журнала', self.author.pk, 10, None)
+        self.assertEqual([pk for pk, _ in hits], [note.pk])
+
+    def test_batch_operations(self):
+        """
+        Пакет create, update и delete применяется за несколько запросов.
+
+        Версии, поисковый индекс и кеш списка обновляются для всего
+        пакета, пустые slug подбираются без коллизий.
+        """
+        Note.objects.bulk_create(
+            Note(title=f'Старая {index}', text='Текст', slug=f'old-{index}',
+                 author=self.author)
+            for index in range(300)
+        )
+        ids = list(
+            Note.objects.order_by('id').values_list('id', flat=True)
+        )
+        record_initial_revisions(Note.objects.all())
+        Note.objects.create(
+            title='Заметка', text='Текст', slug='zametka', author=self.author
+        )
+        self.author_client.get(reverse('notes:list'))
+        operations = [
+            {'op': 'create', 'title': 'Заметка', 'text': f'Новая {index}'}
+            for index in range(200)
+        ] + [
+            {'op': 'update', 'id': pk, 'title': f'Правка {pk}',
+             'text': 'Правленый текст', 'slug': f'edited-{pk}'}
+            for pk in ids[:200]
+        ] + [{'op': 'delete', 'id': pk} for pk in ids[200:]]
+        url = reverse('notes:batch')
+        # bulk-запросы SQLite делит на части примерно по 160 строк.
+        with CaptureQueriesContext(connection) as queries:
+            response = self.author_client.post(
+                url, json.dumps({'operations': operations}),
+                content_type='application/json',
+            )
+        self.assertLessEqual(len(queries), 25)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        results = response.json()['results']
+        self.assertEqual(len(results), 500)
+        self.assertTrue(all(row['status'] == 'ok' for row in results))
+        self.assertEqual(
+            Note.objects.filter(author=self.author).count(), 401
+        )
+        created = Note.objects.filter(title='Заметка').exclude(
+            slug='zametka'
+        )
+        self.assertEqual(
+            sorted(created.values_list('slug', flat=True)),
+            sorted(f'zametka-{index}' for index in range(2, 202)),
+        )
+        self.assertEqual(
+            NoteRevision.objects.filter(note__in=created, number=1).count(),
+            200,
+        )
+        edited = Note.objects.get(pk=ids[0])
+        self.assertEqual(edited.slug, f'edited-{ids[0]}')
+        self.assertEqual(get_revision(edited, 2).text, 'Правленый текст')
+        response = self.author_client.get(reverse('notes:list'))
+        self.assertNotIn(
+            'old-250', [note.slug for note in response.context['object_list']]
+        )
+        if search.is_available():
+            hits, _ = search.search('Правленый', self.author.pk, 500, None)
+            self.assertEqual(len(hits), 200)
+
+    def test_batch_is_all_or_nothing(self):
+        """
+        Пакет с ошибкой не применяется ни в какой части.
+
+        Чужие заметки, занятые и повторённые в пакете slug
+        дают ошибку у своей операции.
+        """
+        own = Note.objects.create(
+            title='Своя', text='Текст', slug='own', author=self.author
+        )
+        other = Note.objects.create(
+            title='Чужая', text='Текст', slug='other', author=self.not_author
+        )
+        operations = [
+            {'op': 'create', 'title': 'Новая', 'text': 'Текст'},
+            {'op': 'update', 'id': own.pk, 'title': 'Своя', 'text': 'Ещё',
+             'slug': 'own'},
+            {'op': 'delete', 'id': other.pk},
+            {'op': 'create', 'title': 'Новая', 'text': 'Текст',
+             'slug': 'other'},
+            {'op': 'create', 'title': 'Новая', 'text': 'Текст',
+             'slug': 'twice'},
+            {'op': 'create', 'title': 'Новая', 'text': 'Текст',
+             'slug': 'twice'},
+            {'op': 'create', 'title': 'Новая'},
+        ]
+        response = self.author_client.post(
+            reverse('notes:batch'), json.dumps({'operations': operations}),
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertEqual(
+            [row['status'] for row in response.json()['results']],
+            ['ok', 'ok', 'error', 'error', 'ok', 'error', 'error'],
+        )
+        self.assertEqual(
+            response.json()['results'][3]['errors']['slug'],
+            ['other' + WARNING],
+        )
+        self.assertEqual(Note.objects.count(), 2)
+        own.refresh_from_db()
+        self.assertEqual(own.text, 'Текст')
+        for operation in (
+            {'op': 'delete'},
+            {'op': 'delete', 'id': True},
+            {'op': 'update', 'id': 2 ** 64, 'title': 'Заголовок'},
+            {'op': 'create', 'title': 'Заголовок', 'slug': ['список']},
+            {'op': 'create', 'title': {}, 'text': 'Текст'},
+            {'op': 'create', 'title': 'Заголовок', 'text': 1},
+        ):
+            with self.subTest(operation=operation):
+                response = self.author_client.post(
+                    reverse('notes:batch'),
+                    json.dumps({'operations': [operation]}),
+                    content_type='application/json',
+                )
+                self.assertEqual(
+                    response.status_code, HTTPStatus.BAD_REQUEST
+                )
+                self.assertIn('error', response.json())
+
+    def test_sqlite_connection_is_tuned(self):
+        """
+        К соединению применены SQLITE_PRAGMAS.
+
+        Сломанное постоянное соединение закрывается перед запросом.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(
+                cursor.fetchone()[0],
+                settings.SQLITE_PRAGMAS['busy_timeout'],
+            )
+        broken = sqlite3.connect(':memory:')
+        broken.close()
+        stale, healthy = (
+            mock.Mock(
+                vendor='sqlite', connection=raw, in_atomic_block=False,
+                settings_dict={'CONN_MAX_AGE': 60},
+            )
+            for raw in (broken, sqlite3.connect(':memory:'))
+        )
+        with mock.patch.object(db, 'connections') as connections:
+            connections.all.return_value = [stale, healthy]
+            db.check_connections(sender=None)
+        stale.close.assert_called_once()
+        healthy.close.assert_not_called()
+
+    def test_reads_go_to_replicas_until_user_writes(self):
+        """
+        Чтение истории заметки идёт с реплик, после записи - с основной.
+
+        Кеш списка и заметок собирается по основной базе. Реплики,
+        отставшие больше REPLICA_MAX_LAG, не используются; в режиме lag
+        выбирается наименее отставшая.
+        """
+        note = Note.objects.create(
+            title='Заголовок', text='Текст', author=self.author
+        )
+        chosen = []
+        db_for_read = ReplicaRouter.db_for_read
+
+        def record(router, model, **hints):
+            chosen.append(db_for_read(router, model, **hints))
+            return 'default'
+
+        history_url = reverse('notes:history', args=(note.slug,))
+        with self.settings(REPLICA_DATABASES=['replica1']), mock.patch.object(
+                ReplicaRouter, 'db_for_read', record
+        ), mock.patch.object(ReplicaRouter, 'lag', return_value=0):
+            self.author_client.get(reverse('notes:list'))
+            self.assertEqual(set(chosen), {'default'})
+            chosen.clear()
+            self.author_client.get(history_url)
+            self.assertEqual(set(chosen), {'replica1'})
+            response = self.author_client.post(
+                reverse('notes:edit', args=(note.slug,)),
+                {'title': 'Новый', 'text': 'Текст', 'slug': note.slug},
+            )
+            self.assertEqual(
+                response.cookies[PIN_COOKIE]['max-age'],
+                settings.REPLICA_MAX_LAG + settings.REPLICA_LAG_CHECK_INTERVAL,
+            )
+            chosen.clear()
+            self.author_client.get(history_url)
+            self.assertEqual(set(chosen), {'default'})
+        router = ReplicaRouter()
+        lags = {'replica1': 40, 'replica2': 3}
+        with self.settings(REPLICA_DATABASES=list(lags)), mock.patch.object(
+                router, 'lag', lags.get
+        ):
+            with read_from_replicas():
+                self.assertEqual(router.db_for_read(Note), 'replica2')
+                self.assertEqual(router.db_for_read(Note), 'replica2')
+        with self.settings(
+                REPLICA_DATABASES=list(lags), REPLICA_SELECTION='lag'
+        ), mock.patch.object(router, 'lag', lags.get):
+            with read_from_replicas():
+                self.assertEqual(router.db_for_read(Note), 'replica2')
+                lags['replica2'] = 60
+                self.assertEqual(router.db_for_read(Note), 'default')
+
+    def test_prod_caches_are_shared(self):
+        """
+        В продакшене заметки и сессии кешируются в memcached.
+
+        Без общего кеша заметки не кешируются, а сессии и
+        пользователи читаются из базы.
+        """
+        def load(**environ):
+            with mock.patch.dict(
+                    os.environ, DJANGO_SECRET_KEY='secret'
+            ), mock.patch.dict(sys.modules):
+                os.environ.pop('DJANGO_MEMCACHED_LOCATION', None)
+                os.environ.update(environ)
+                sys.modules.pop('yanote.settings_prod', None)
+                return importlib.import_module('yanote.settings_prod')
+
+        prod = load(DJANGO_MEMCACHED_LOCATION='a:11211,b:11211')
+        for alias in ('default', 'sessions'):
+            self.assertEqual(
+                prod.CACHES[alias]['LOCATION'], ['a:11211', 'b:11211']
+            )
+        prod = load()
+        self.assertTrue(
+            prod.CACHES['default']['BACKEND'].endswith('DummyCache')
+        )
+        self.assertEqual(
+            prod.SESSION_ENGINE, 'django.contrib.sessions.backends.db'
+        )
+
+    def test_template_warm_up_compiles_all_templates(self):
+        """Прогрев кладёт в кеш загрузчика cached все шаблоны."""
+        engine = build_engine(cached=True)
+        count = warm_up(engine)
+        names = template_names(engine)
+        self.assertIn('notes/list.html', names)
+        self.assertEqual(count, len(names))
+        self.assertEqual(
+            len(engine.template_loaders[0].get_template_cache), count
+        )
+
+    def test_responses_are_compressed(self):
+        """
+        Страница заметки сжимается gzip, повторно - из кеша.
+
+        Клиент без gzip в Accept-Encoding получает тело как есть.
+        """
+        note = Note.objects.create(
+            title='Журнал', text='Строка журнала\n' * 500, author=self.author
+        )
+        url = reverse('notes:detail', args=(note.slug,))
+        plain = self.author_client.get(url)
+        self.assertNotIn('Content-Encoding', plain)
+        for cached in (0, 1):
+            response = self.author_client.get(
+                url, HTTP_ACCEPT_ENCODING='gzip, deflate'
+            )
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+            self.assertEqual(response['ETag'], 'W/' + plain['ETag'])
+            self.assertEqual(gzip.decompress(response.content), plain.content)
+            self.assertEqual(compression_stats()['cached'], cached)
+        self.assertLess(compression_stats()['ratio'], 0.2)
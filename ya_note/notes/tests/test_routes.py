@@ -1,20 +1,26 @@
 from http import HTTPStatus
 
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.core.cache import cache, caches
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
+from notes.middleware import QueryBudgetExceeded
 from notes.models import Note
 
 User = get_user_model()
 
 
+@override_settings(QUERY_BUDGET_ENFORCE=True)
 class TestRoutes(TestCase):
     """Класс тестирования маршрутов."""
 
     @classmethod
     def setUpTestData(cls):
         """Фикстуры."""
+        # id пользователей повторяются после отката базы, а кеш
+        # пользователей и сессий - нет.
+        caches['sessions'].clear()
         cls.author = User.objects.create(username='author')
         cls.author_client = Client()
         cls.author_client.force_login(cls.author)
@@ -37,6 +43,10 @@ class TestRoutes(TestCase):
         cls.name_url_delete = 'notes:delete'
         cls.name_url_login = 'users:login'
 
+    def setUp(self):
+        """Кеш не откатывается вместе с базой между тестами."""
+        cache.clear()
+
     def test_pages_availability_for_anonymous_user(self):
         """
         Тест доступности страниц для анонимных пользователей.
@@ -68,6 +78,7 @@ class TestRoutes(TestCase):
             (self.name_url_add),
             (self.name_url_success),
             (self.name_url_list),
+            ('notes:search'),
         )
         for name in urls:
             with self.subTest(name=name):
@@ -91,7 +102,8 @@ class TestRoutes(TestCase):
             for name in (
                 self.name_url_detail,
                 self.name_url_edit,
-                self.name_url_delete
+                self.name_url_delete,
+                'notes:history',
             ):
                 with self.subTest(user=user, name=name):
                     url = reverse(name, args=(self.note.slug,))
@@ -112,9 +124,12 @@ class TestRoutes(TestCase):
             (self.name_url_add, None),
             (self.name_url_success, None),
             (self.name_url_list, None),
+            ('notes:search', None),
             (self.name_url_detail, (self.note.slug,)),
             (self.name_url_edit, (self.note.slug,)),
-            (self.name_url_delete, (self.note.slug,))
+            (self.name_url_delete, (self.note.slug,)),
+            ('notes:history', (self.note.slug,)),
+            ('notes:restore', (self.note.slug, 1)),
         )
         for name, args in urls:
             with self.subTest(name=name):
@@ -122,3 +137,13 @@ class TestRoutes(TestCase):
                 redirect_url = f'{login_url}?next={url}'
                 response = self.client.get(url)
                 self.assertRedirects(response, redirect_url)
+        url = reverse('notes:batch')
+        response = self.client.post(url, '{}', content_type='application/json')
+        self.assertRedirects(response, f'{login_url}?next={url}')
+
+    def test_query_budget_is_enforced(self):
+        """Маршрут, превысивший бюджет запросов, роняет тест."""
+        url = reverse(self.name_url_list)
+        with override_settings(QUERY_BUDGETS={self.name_url_list: 0}):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.author_client.get(url)
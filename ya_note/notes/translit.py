@@ -0,0 +1,77 @@
+import re
+
+from pytils.translit import ALPHABET, TRANSTABLE
+
+AMPERSAND = re.compile(r'&amp;|&')
+SEPARATORS = re.compile(r'[-\s]+')
+NOT_SLUG = re.compile(r'[^\w\s-]')
+# Разделитель заголовков в slugify_many(): ни одно из регулярных
+# выражений выше его не трогает.
+BATCH_SEPARATOR = '\x00'
+
+
+class SlugTable(dict):
+    """
+    Таблица для str.translate: символ вне алфавита pytils удаляется.
+
+    Такие символы добавляются в таблицу при первой встрече, чтобы
+    __missing__() вызывался для каждого из них один раз.
+    """
+
+    def __missing__(self, key):
+        self[key] = None
+        return None
+
+
+def _build_table():
+    """
+    Таблица перевода символа сразу в итоговый вид.
+
+    Повторяет шаги pytils.translit.slugify после разбиения на слова:
+    отбрасывает символы вне ALPHABET, транслитерирует по первой
+    подходящей паре TRANSTABLE и удаляет всё, кроме букв, цифр,
+    подчёркивания и дефиса.
+    """
+    table = SlugTable()
+    for symbol in ALPHABET:
+        if len(symbol) != 1 or ord(symbol) in table:
+            continue
+        translit = next(
+            (out for source, out in TRANSTABLE if source == symbol), symbol
+        )
+        table[ord(symbol)] = NOT_SLUG.sub('', translit)
+    return table
+
+
+TABLE = _build_table()
+
+
+def _slugify(text):
+    text = SEPARATORS.sub('-', AMPERSAND.sub(' and ', text.lower()))
+    return text.translate(TABLE)
+
+
+def slugify(text):
+    """То же, что pytils.translit.slugify, за три прохода по строке."""
+    return _slugify(str(text))
+
+
+def slugify_many(texts):
+    """
+    Slug для списка заголовков одним проходом по их склейке.
+
+    Накладные расходы на вызов регулярных выражений и translate
+    платятся один раз на пачку, а не на каждый заголовок.
+    """
+    texts = [str(text) for text in texts]
+    if not texts:
+        return []
+    if any(BATCH_SEPARATOR in text for text in texts):
+        return [_slugify(text) for text in texts]
+    text = BATCH_SEPARATOR.join(texts).lower()
+    text = SEPARATORS.sub('-', AMPERSAND.sub(' and ', text))
+    return text.translate(BATCH_TABLE).split(BATCH_SEPARATOR)
+
+
+BATCH_TABLE = SlugTable(TABLE)
+BATCH_TABLE[ord(BATCH_SEPARATOR)] = BATCH_SEPARATOR
@@ -1,15 +1,31 @@
+from django.conf import settings
 from django.urls import path
 
-from notes import views
+from notes import async_views, views
 
 app_name = 'notes'
 
+if settings.ASYNC_VIEWS:
+    list_view = async_views.notes_list
+    detail_view = async_views.note_detail
+else:
+    list_view = views.NotesList.as_view()
+    detail_view = views.NoteDetail.as_view()
+
 urlpatterns = [
     path('', views.Home.as_view(), name='home'),
     path('add/', views.NoteCreate.as_view(), name='add'),
     path('edit/<slug:slug>/', views.NoteUpdate.as_view(), name='edit'),
-    path('note/<slug:slug>/', views.NoteDetail.as_view(), name='detail'),
+    path('note/<slug:slug>/', detail_view, name='detail'),
     path('delete/<slug:slug>/', views.NoteDelete.as_view(), name='delete'),
-    path('notes/', views.NotesList.as_view(), name='list'),
+    path('history/<slug:slug>/', views.NoteHistory.as_view(), name='history'),
+    path(
+        'restore/<slug:slug>/<int:number>/',
+        views.NoteRestore.as_view(),
+        name='restore'
+    ),
+    path('notes/', list_view, name='list'),
+    path('search/', views.NoteSearch.as_view(), name='search'),
+    path('batch/', views.NoteBatch.as_view(), name='batch'),
     path('done/', views.NoteSuccess.as_view(), name='success'),
 ]
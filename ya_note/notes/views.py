@@ -1,9 +1,19 @@
+import hashlib
+from http import HTTPStatus
+
+from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.db import IntegrityError
+from django.http import Http404, HttpResponseRedirect, JsonResponse
 from django.urls import reverse_lazy
+from django.utils.decorators import method_decorator
 from django.views import generic
+from django.views.decorators.http import condition
 
+from . import batch, cache, revisions, search
+from .db import SQL_INTEGER_MAX, SQL_INTEGER_MIN
 from .forms import NoteForm
-from .models import Note
+from .models import Note, NoteRevision
 
 
 class Home(generic.TemplateView):
@@ -32,9 +42,7 @@ class NoteCreate(NoteBase, generic.CreateView):
     form_class = NoteForm
 
     def form_valid(self, form):
-        new_note = form.save(commit=False)
-        new_note.author = self.request.user
-        new_note.save()
+        form.instance.author = self.request.user
         return super().form_valid(form)
 
 
@@ -53,7 +61,189 @@ class NotesList(NoteBase, generic.ListView):
     """Список всех заметок пользователя."""
     template_name = 'notes/list.html'
 
+    def get_queryset(self):
+        """
+        Страница заметок после ?after=<id> без поля text.
+
+        Выборка идёт по индексу (author, id), поэтому память и время
+        не зависят от того, сколько всего заметок у пользователя.
+        """
+        try:
+            after = int(self.request.GET.get('after', 0))
+        except ValueError:
+            raise Http404('Некорректный курсор списка заметок.')
+        if not SQL_INTEGER_MIN <= after <= SQL_INTEGER_MAX:
+            raise Http404('Некорректный курсор списка заметок.')
+        notes, self.next_cursor = cache.get_or_build(
+            cache.LIST_KEY, self.request.user.pk,
+            lambda: self.get_page(after), after=after
+        )
+        return notes
+
+    def get_page(self, after):
+        """Страница из базы и курсор следующей страницы."""
+        size = settings.NOTES_COUNT_ON_PAGE
+        notes = list(
+            super().get_queryset().filter(id__gt=after).only(
+                'id', 'slug', 'title'
+            ).order_by('id')[:size + 1]
+        )
+        next_cursor = notes[size - 1].id if len(notes) > size else None
+        return notes[:size], next_cursor
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['next_cursor'] = self.next_cursor
+        return context
+
+
+class NoteSearch(NoteBase, generic.ListView):
+    """Полнотекстовый поиск по заметкам пользователя."""
+    template_name = 'notes/search.html'
 
+    def get_queryset(self):
+        """
+        Найденные заметки в порядке релевантности.
+
+        Заметки загружаются через get_queryset() базового класса, так
+        что в выдачу попадают только заметки текущего пользователя.
+        """
+        try:
+            hits, self.next_cursor = search.search(
+                self.request.GET.get('q', ''),
+                self.request.user.pk,
+                settings.NOTES_SEARCH_RESULTS_ON_PAGE,
+                self.request.GET.get('after'),
+            )
+        except search.InvalidCursor:
+            raise Http404('Некорректный курсор поиска.')
+        notes = super().get_queryset().only(
+            'id', 'slug', 'title'
+        ).in_bulk([pk for pk, _ in hits])
+        found = []
+        for pk, snippet in hits:
+            if pk in notes:
+                notes[pk].snippet = snippet
+                found.append(notes[pk])
+        return found
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['query'] = self.request.GET.get('q', '')
+        context['next_cursor'] = self.next_cursor
+        return context
+
+
+def get_note(request, slug):
+    """
+    Заметка автора по slug из кеша автора.
+
+    Запоминается в запросе, чтобы ETag, Last-Modified и get_object()
+    обращались к кешу один раз.
+    """
+    if not hasattr(request, '_note'):
+        request._note = cache.get_or_build(
+            cache.DETAIL_KEY, request.user.pk,
+            lambda: Note.objects.filter(
+                author=request.user, slug=slug
+            ).first(),
+            slug=slug
+        )
+    return request._note
+
+
+def note_modified(request, slug):
+    """Метка изменения заметки автора."""
+    note = get_note(request, slug)
+    return note.modified if note is not None else None
+
+
+def note_etag(request, slug):
+    modified = note_modified(request, slug)
+    if modified is None:
+        return None
+    version = f'{slug}:{modified.isoformat()}'
+    return hashlib.md5(version.encode()).hexdigest()
+
+
+@method_decorator(
+    condition(etag_func=note_etag, last_modified_func=note_modified),
+    name='get'
+)
 class NoteDetail(NoteBase, generic.DetailView):
     """Заметка подробно."""
     template_name = 'notes/detail.html'
+
+    def get_object(self, queryset=None):
+        note = get_note(self.request, self.kwargs['slug'])
+        if note is None:
+            raise Http404('Заметка не найдена.')
+        return note
+
+
+class NoteHistory(NoteBase, generic.DetailView):
+    """История версий заметки."""
+    template_name = 'notes/history.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['revisions'] = NoteRevision.objects.filter(
+            note=self.object
+        ).defer('data').order_by('-number')
+        return context
+
+
+class NoteRestore(NoteBase, generic.DetailView):
+    """Восстановление заметки из версии."""
+    template_name = 'notes/restore.html'
+
+    def get_revision(self):
+        revision = revisions.get_revision(self.object, self.kwargs['number'])
+        if revision is None:
+            raise Http404('Версия заметки не найдена.')
+        return revision
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['revision'] = self.get_revision()
+        return context
+
+    def post(self, request, *args, **kwargs):
+        """Восстановленный текст сохраняется как новая версия."""
+        self.object = self.get_object()
+        revision = self.get_revision()
+        self.object.title = revision.title
+        self.object.text = revision.text
+        self.object.save()
+        return HttpResponseRedirect(self.success_url)
+
+
+class NoteBatch(LoginRequiredMixin, generic.View):
+    """
+    Пакет операций create, update и delete над заметками пользователя.
+
+    Каждая операция проверяется по правилам NoteForm; если все
+    операции корректны, пакет применяется в одной транзакции.
+    """
+
+    def post(self, request):
+        try:
+            operations = batch.parse_operations(request.body)
+        except batch.BatchError as error:
+            return JsonResponse(
+                {'error': str(error)}, status=HTTPStatus.BAD_REQUEST,
+                json_dumps_params={'ensure_ascii': False},
+            )
+        try:
+            applied, results = batch.apply_batch(request.user, operations)
+        except IntegrityError:
+            return JsonResponse(
+                {'error': 'Заметки изменены параллельно, повторите пакет.'},
+                status=HTTPStatus.CONFLICT,
+                json_dumps_params={'ensure_ascii': False},
+            )
+        return JsonResponse(
+            {'applied': applied, 'results': results},
+            status=HTTPStatus.OK if applied else HTTPStatus.BAD_REQUEST,
+            json_dumps_params={'ensure_ascii': False},
+        )
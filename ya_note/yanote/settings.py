@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 from django.urls import reverse_lazy
@@ -22,6 +23,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'notes.middleware.QueryCountMiddleware',
+    'notes.middleware.ReplicaMiddleware',
+    'notes.middleware.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -49,6 +53,25 @@ TEMPLATES = [
     },
 ]
 
+# Сжатие ответов gzip, см. middleware.CompressionMiddleware.
+COMPRESSION_LEVEL = 6
+# Более короткие тела не сжимаются: выигрыш меньше накладных расходов.
+COMPRESSION_MIN_SIZE = 1024
+# Сжимаются только ответы с Content-Type, начинающимся с этих строк.
+COMPRESSION_TYPES = (
+    'text/', 'application/json', 'application/javascript',
+    'application/xml', 'image/svg+xml',
+)
+# Потоковый ответ сбрасывается клиенту после стольких байт тела.
+COMPRESSION_STREAM_FLUSH_SIZE = 16 * 1024
+COMPRESSION_CACHE_TIMEOUT = 60 * 15
+# Счётчики сжатия копятся в процессе и переносятся в общий кеш
+# не чаще раза в столько секунд.
+COMPRESSION_STATS_FLUSH_INTERVAL = 10
+
+# Компилировать все шаблоны при запуске, см. settings_prod.py.
+TEMPLATE_WARMUP = False
+
 WSGI_APPLICATION = 'yanote.wsgi.application'
 
 
@@ -56,9 +79,70 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Соединение переиспользуется между запросами, исправность
+        # проверяется перед каждым запросом (см. db.check_connections).
+        'CONN_MAX_AGE': int(os.environ.get('DJANGO_CONN_MAX_AGE', 60)),
     }
 }
 
+# Реплики только для чтения: пути к копиям базы через запятую,
+# например DJANGO_DB_REPLICAS=replica.sqlite3. Псевдонимы replica1...
+REPLICA_DATABASES = []
+for number, name in enumerate(
+        filter(None, os.environ.get('DJANGO_DB_REPLICAS', '').split(',')), 1
+):
+    REPLICA_DATABASES.append(f'replica{number}')
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'], 'NAME': name, 'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['notes.router.ReplicaRouter']
+# Маршруты, которые читают с реплик (только GET и HEAD).
+REPLICA_READ_VIEWS = ('notes:list', 'notes:detail', 'notes:history')
+# round_robin - по кругу, lag - с наименьшим отставанием.
+REPLICA_SELECTION = os.environ.get('DJANGO_DB_REPLICA_SELECTION', 'round_robin')
+# Реплики, отставшие сильнее, не используются, секунды.
+REPLICA_MAX_LAG = 30
+REPLICA_LAG_CHECK_INTERVAL = 5
+# Сколько секунд после записи пользователь читает с основной базы;
+# не меньше отставания, которое допускает маршрутизатор, иначе
+# пользователь может не увидеть свою запись.
+REPLICA_PIN_SECONDS = REPLICA_MAX_LAG + REPLICA_LAG_CHECK_INTERVAL
+
+# Применяются к каждому новому соединению с SQLite.
+SQLITE_PRAGMAS = {
+    # Читатели не блокируют писателя и наоборот.
+    'journal_mode': 'wal',
+    # В режиме WAL не теряет целостность, fsync только на checkpoint.
+    'synchronous': 'normal',
+    # Ждать освобождения блокировки вместо ошибки database is locked, мс.
+    'busy_timeout': 5000,
+    # Кеш страниц в КиБ (отрицательное значение) и отображение файла.
+    'cache_size': -20000,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'memory',
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Сессии и пользователи запросов отдельно от кеша страниц:
+    # их не вытесняют страницы и не сбрасывает cache.clear().
+    'sessions': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'sessions',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+
+# Сессия читается из кеша, а записывается и в кеш, и в базу.
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+SESSION_CACHE_ALIAS = 'sessions'
+# request.user берётся из кеша SESSION_CACHE_ALIAS, см. notes.auth.
+AUTHENTICATION_BACKENDS = ['notes.auth.CachedModelBackend']
+USER_CACHE_TIMEOUT = 60 * 15
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -87,3 +171,53 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 LOGIN_URL = reverse_lazy('users:login')
 LOGIN_REDIRECT_URL = reverse_lazy('notes:home')
+
+NOTES_COUNT_ON_PAGE = 100
+
+NOTES_SEARCH_RESULTS_ON_PAGE = 20
+
+# Время жизни списка и заметок автора в кеше, в секундах.
+NOTES_CACHE_TIMEOUT = 60 * 15
+
+# Каждая такая версия заметки хранится целиком, остальные - разницей.
+NOTE_REVISION_SNAPSHOT_EVERY = 20
+
+# Наибольшее число операций в одном запросе к notes:batch.
+NOTES_BATCH_MAX_OPERATIONS = 1000
+
+# Асинхронные представления для чтения; включаются в asgi.py.
+ASYNC_VIEWS = os.environ.get('DJANGO_ASYNC_VIEWS') == '1'
+# Потоков для запросов к базе из async-представлений,
+# 0 - выполнять их в общем потоке Django.
+ASYNC_DB_POOL_SIZE = int(os.environ.get('DJANGO_ASYNC_DB_POOL_SIZE', 8))
+
+# Максимальное число запросов к базе на один запрос к маршруту.
+QUERY_BUDGETS = {
+    'notes:home': 0,
+    'notes:add': 8,
+    'notes:edit': 8,
+    'notes:detail': 2,
+    'notes:delete': 4,
+    'notes:history': 2,
+    'notes:restore': 8,
+    'notes:list': 1,
+    'notes:search': 2,
+    # Рассчитан на пакет из NOTES_BATCH_MAX_OPERATIONS операций.
+    'notes:batch': 38,
+    'notes:success': 0,
+    'users:login': 2,
+    'users:logout': 2,
+    'users:signup': 2,
+}
+QUERY_BUDGET_ENFORCE = False
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'notes.middleware': {'handlers': ['console'], 'level': 'INFO'},
+    },
+}
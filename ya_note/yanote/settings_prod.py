@@ -0,0 +1,76 @@
+"""
+Настройки для продакшена: DJANGO_SETTINGS_MODULE=yanote.settings_prod.
+
+Отличаются от settings.py выключенным DEBUG, загрузчиком шаблонов
+cached с компиляцией всех шаблонов при запуске, логированием запросов
+к базе только при превышении бюджета и кешем, общим для всех
+процессов сервера.
+"""
+import os
+
+from .settings import *  # noqa: F401, F403
+from .settings import ALLOWED_HOSTS, CACHES, LOGGING, TEMPLATES
+
+SECRET_KEY = os.environ['DJANGO_SECRET_KEY']
+
+# Без DEBUG Django не копит запросы в connection.queries.
+DEBUG = False
+
+ALLOWED_HOSTS = os.environ.get(
+    'DJANGO_ALLOWED_HOSTS', ','.join(ALLOWED_HOSTS)
+).split(',')
+
+TEMPLATES = [{
+    **TEMPLATES[0],
+    'APP_DIRS': False,
+    'OPTIONS': {
+        **TEMPLATES[0]['OPTIONS'],
+        'context_processors': [
+            processor
+            for processor in TEMPLATES[0]['OPTIONS']['context_processors']
+            if processor != 'django.template.context_processors.debug'
+        ],
+        # Шаблон читается и компилируется один раз на процесс.
+        'loaders': [(
+            'django.template.loaders.cached.Loader', [
+                'django.template.loaders.filesystem.Loader',
+                'django.template.loaders.app_directories.Loader',
+            ],
+        )],
+    },
+}]
+# Компилировать все шаблоны из templates/ при запуске wsgi.py и asgi.py.
+TEMPLATE_WARMUP = os.environ.get('DJANGO_TEMPLATE_WARMUP', '1') == '1'
+
+LOGGING = {
+    **LOGGING,
+    'loggers': {
+        'notes.middleware': {'handlers': ['console'], 'level': 'WARNING'},
+    },
+}
+
+# Адреса memcached через запятую, например 10.0.0.1:11211,10.0.0.2:11211.
+MEMCACHED_LOCATION = os.environ.get('DJANGO_MEMCACHED_LOCATION')
+if MEMCACHED_LOCATION:
+    CACHES = {
+        alias: {
+            'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+            'LOCATION': MEMCACHED_LOCATION.split(','),
+            'KEY_PREFIX': f'yanote:{alias}',
+        }
+        for alias in CACHES
+    }
+else:
+    # Заметки в памяти процесса не сбрасывались бы правкой, сделанной
+    # в другом процессе: без общего кеша они не кешируются.
+    CACHES = {
+        **CACHES,
+        'default': {
+            'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+        },
+    }
+    # Кеш в памяти процесса другие процессы не видят: сессия после
+    # выхода и пользователь после смены пароля оставались бы в их
+    # кешах. Без общего кеша сессия и пользователь читаются из базы.
+    SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+    AUTHENTICATION_BACKENDS = ['django.contrib.auth.backends.ModelBackend']